@@ -0,0 +1,48 @@
+import json
+from datetime import date
+
+from flask import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def dumps(data):
+    """Serialize to compact JSON bytes, with orjson when it is installed.
+
+    Datetimes are written as ISO 8601 either way.
+    """
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, default=_default, separators=(',', ':')).encode()
+
+
+def json_response(data, status=200):
+    return Response(dumps(data), status=status, mimetype='application/json')
+
+
+def error_response(status, message):
+    return json_response({'error': message}, status)
+
+
+def parse_fields(value, available, default):
+    """The field names asked for with ?fields=a,b,c, in the order given.
+
+    `available` lists every selectable field and `default` is used when
+    nothing is asked for. Raises ValueError naming any unknown field.
+    """
+    if not value:
+        return list(default)
+    fields = list(dict.fromkeys(field.strip() for field in value.split(',') if field.strip()))
+    unknown = [field for field in fields if field not in available]
+    if unknown:
+        raise ValueError('Unknown field(s): ' + ', '.join(unknown))
+    return fields
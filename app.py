@@ -1,20 +1,40 @@
 #----------------------------------------------------------------------------#
 # Imports
 #----------------------------------------------------------------------------#
+import re
+import os
 import sys
 import json
-import dateutil.parser
-import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for, jsonify
+import hashlib
+import threading
+import time
+from bisect import insort
+import click
+from flask import Flask, render_template, request, Response, flash, redirect, url_for, jsonify, abort, g
 from flask_moment import Moment
 from flask_sqlalchemy import SQLAlchemy
 import logging
 from logging import Formatter, FileHandler
 from flask_wtf import Form
 from forms import *
-from flask_migrate import Migrate
-from datetime import datetime
-from sqlalchemy import Column, Integer, DateTime, String, Boolean, PickleType
+from search import NameIndex
+from availability import overlapping, first_overlap, free_slots
+from geo import CityCentroids, bounding_box, covering_prefixes, prefix_range, distance_km, encode as geohash
+from cache import ResponseCache
+from templating import TemplateCache
+from assets import StaticAssets, build_assets
+from compression import ResponseCompression
+from formatting import format_datetime
+from instrumentation import QueryMetrics
+from api import json_response, error_response, parse_fields
+from routing import RoutingSession, route_reads, read_engine
+from bulk import read_records, batches, Checkpoint, reserve_ids, insert_rows, Throughput, with_genres, EXPORT_FORMATS
+from werkzeug.datastructures import MultiDict
+from datetime import datetime, timedelta
+from sqlalchemy import event, select, insert, update, delete, text, Column, Integer, Float, DateTime, String, Boolean, func, and_, or_, case, tuple_, union_all
+from sqlalchemy.ext.associationproxy import association_proxy
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
@@ -22,8 +42,13 @@ from sqlalchemy import Column, Integer, DateTime, String, Boolean, PickleType
 app = Flask(__name__)
 moment = Moment(app)
 app.config.from_object('config')
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
+db = SQLAlchemy(app, session_options={'class_': RoutingSession})
+route_reads(app)
+response_cache = ResponseCache(app)
+template_cache = TemplateCache(app)
+static_assets = StaticAssets(app)
+response_compression = ResponseCompression(app)
+query_metrics = QueryMetrics(app)
 
 #----------------------------------------------------------------------------#
 # Models.
@@ -34,7 +59,6 @@ class Venue(db.Model):
 
     id = Column(Integer, primary_key=True)
     name = Column(String(120), nullable=False)
-    genres = Column(PickleType, nullable=False)
     address = Column(String(120), nullable=False)
     city = Column(String(120), nullable=False)
     state = Column(String(120), nullable=False)
@@ -44,7 +68,25 @@ class Venue(db.Model):
     seeking_talent = Column(Boolean, default=False)
     seeking_description = Column(String(500))
     image_link = Column(String(500))
+    # the venue's own coordinates, or the centre of its city (see venue_location)
+    latitude = Column(Float)
+    longitude = Column(Float)
+    geohash = Column(String(12))
+    version = Column(Integer, nullable=False, default=1)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
     shows = db.relationship('Show', backref='Venue', lazy=True)
+    genre_rows = db.relationship('VenueGenre', lazy=True, cascade='all, delete-orphan')
+    genres = association_proxy('genre_rows', 'genre', creator=lambda genre: VenueGenre(genre=genre))
+
+    __table_args__ = (
+      db.Index('ix_Venue_city_state', 'city', 'state'),
+      # nearby searches read one range of geohash prefixes per cell around the
+      # point; with PostGIS, a GiST index on VENUE_GEOGRAPHY is used instead
+      db.Index('ix_Venue_geohash', 'geohash'),
+      # finds the names changed since the name index was last refreshed
+      db.Index('ix_Venue_updated_at', 'updated_at'),
+    )
+    __mapper_args__ = {'version_id_col': version}
 
     def __repr__(self):
       return f'<Venue {self.id} {self.name}>'
@@ -54,7 +96,6 @@ class Artist(db.Model):
 
     id = Column(Integer, primary_key=True)
     name = Column(String(120), nullable=False)
-    genres = Column(PickleType, nullable=False)
     city = Column(String(120), nullable=False)
     state = Column(String(120), nullable=False)
     phone = Column(String(120), nullable=False)
@@ -63,7 +104,16 @@ class Artist(db.Model):
     seeking_venue = Column(Boolean, default=False)
     seeking_description = Column(String(500))
     image_link = Column(String(500))
+    version = Column(Integer, nullable=False, default=1)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
     shows = db.relationship('Show', backref='Artist', lazy=True)
+    genre_rows = db.relationship('ArtistGenre', lazy=True, cascade='all, delete-orphan')
+    genres = association_proxy('genre_rows', 'genre', creator=lambda genre: ArtistGenre(genre=genre))
+
+    __table_args__ = (
+      db.Index('ix_Artist_updated_at', 'updated_at'),
+    )
+    __mapper_args__ = {'version_id_col': version}
 
     def __repr__(self):
       return f'<Artist {self.id} {self.name}>'
@@ -75,24 +125,879 @@ class Show(db.Model):
     venue_id = Column(Integer, db.ForeignKey('Venue.id'), nullable=False)
     artist_id = Column(Integer, db.ForeignKey('Artist.id'), nullable=False)
     start_time = Column(DateTime, nullable=False)
+    # minutes, at most MAX_SHOW_DURATION
+    duration = Column(Integer, nullable=False, default=DEFAULT_SHOW_DURATION,
+                      server_default=str(DEFAULT_SHOW_DURATION))
+    version = Column(Integer, nullable=False, default=1)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # venue and artist pages read a venue's (or artist's) shows by time;
+    # /shows pages through all shows in (start_time, id) order. As no show is
+    # longer than MAX_SHOW_DURATION, the same indexes find the shows overlapping
+    # a time range with a range scan (see booked_shows).
+    __table_args__ = (
+      db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time'),
+      db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time'),
+      db.Index('ix_Show_start_time_id', 'start_time', 'id'),
+    )
+    __mapper_args__ = {'version_id_col': version}
 
     def __repr__(self):
       return f'<Show {self.id}, Venue {self.venue_id}, Artist {self.artist_id} >'
+
+# Genres are stored one row per (venue or artist, genre) so they can be
+# indexed and filtered in the database; the genre index serves genre lookups.
+class VenueGenre(db.Model):
+    __tablename__ = 'VenueGenre'
+
+    venue_id = Column(Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), primary_key=True)
+    genre = Column(String(120), primary_key=True, index=True)
+
+    def __repr__(self):
+      return f'<VenueGenre {self.venue_id} {self.genre}>'
+
+class ArtistGenre(db.Model):
+    __tablename__ = 'ArtistGenre'
+
+    artist_id = Column(Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), primary_key=True)
+    genre = Column(String(120), primary_key=True, index=True)
+
+    def __repr__(self):
+      return f'<ArtistGenre {self.artist_id} {self.genre}>'
+
+# Upcoming and past show counts per venue and artist, kept up to date by the
+# handlers that add or remove shows, so listings read a count instead of
+# counting shows. A counter is stale once its next_show has started; reads
+# recount those from Show and `flask refresh-show-counts` refreshes them.
+class VenueShowCount(db.Model):
+    __tablename__ = 'VenueShowCount'
+
+    venue_id = Column(Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), primary_key=True)
+    upcoming = Column(Integer, nullable=False, default=0)
+    past = Column(Integer, nullable=False, default=0)
+    next_show = Column(DateTime, index=True)
+
+    def __repr__(self):
+      return f'<VenueShowCount {self.venue_id} {self.upcoming}/{self.past}>'
+
+class ArtistShowCount(db.Model):
+    __tablename__ = 'ArtistShowCount'
+
+    artist_id = Column(Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), primary_key=True)
+    upcoming = Column(Integer, nullable=False, default=0)
+    past = Column(Integer, nullable=False, default=0)
+    next_show = Column(DateTime, index=True)
+
+    def __repr__(self):
+      return f'<ArtistShowCount {self.artist_id} {self.upcoming}/{self.past}>'
+
+# A version number per response cache tag ('venues', 'venue:3', ...), moved by
+# every write that invalidates the tag (see pages_changed). Page ETags are built
+# from these rows, so validating a page reads a row by primary key per tag
+# instead of aggregating the tables the page lists.
+class PageVersion(db.Model):
+    __tablename__ = 'PageVersion'
+
+    tag = Column(String(120), primary_key=True)
+    version = Column(Integer, nullable=False, default=1)
+
+    def __repr__(self):
+      return f'<PageVersion {self.tag} {self.version}>'
         
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format)
-
+# start times are handed to templates as datetimes and formatted only here
 app.jinja_env.filters['datetime'] = format_datetime
 
+#----------------------------------------------------------------------------#
+# Queries.
+#----------------------------------------------------------------------------#
+
+def genre_filter(model, genre):
+  # restricts a venue (or artist) query to those listed under genre, through the genre index
+  if model is Venue:
+    ids = select(VenueGenre.venue_id).where(VenueGenre.genre == genre)
+  else:
+    ids = select(ArtistGenre.artist_id).where(ArtistGenre.genre == genre)
+  return model.id.in_(ids)
+
+def venue_areas(genre=None):
+  # One query returns every venue with its number of upcoming shows from its
+  # counter; the outer join keeps venues that have no shows at all (count is 0).
+  query = db.session.query(
+      Venue.id,
+      Venue.name,
+      Venue.version,
+      Venue.city,
+      Venue.state,
+      upcoming_count(Venue, datetime.now()).label('num_upcoming_shows')
+    ).outerjoin(VenueShowCount, VenueShowCount.venue_id == Venue.id)
+
+  if genre:
+    query = query.filter(genre_filter(Venue, genre))
+
+  rows = query.order_by(Venue.id).all()
+
+  # Venue locations are grouped by city and state in a single pass
+  areas = {}
+  for row in rows:
+    area = areas.get((row.city, row.state))
+    if area is None:
+      area = areas[(row.city, row.state)] = {
+        "city": row.city,
+        "state": row.state,
+        "venues": []
+      }
+    area['venues'].append({
+      "id": row.id,
+      "name": row.name,
+      "version": row.version,
+      "num_upcoming_shows": row.num_upcoming_shows
+    })
+
+  return list(areas.values())
+
+# counter table, its owner column and the matching Show column of venues and artists
+SHOW_COUNTS = {
+  Venue: (VenueShowCount, VenueShowCount.venue_id, Show.venue_id),
+  Artist: (ArtistShowCount, ArtistShowCount.artist_id, Show.artist_id),
+}
+
+def upcoming_count(model, now):
+  # A venue's (or artist's) upcoming show count, read from its counter; a counter
+  # whose next show has started since it was refreshed is recounted from Show.
+  # Select it from the counter table outer joined to the venue (or artist).
+  counts, count_owner, show_owner = SHOW_COUNTS[model]
+  recount = select(func.count(Show.id)) \
+    .where(show_owner == count_owner, Show.start_time > now) \
+    .scalar_subquery()
+  return case((counts.next_show <= now, recount), else_=func.coalesce(counts.upcoming, 0))
+
+def show_counts(model, owner_id, now):
+  # upcoming and past show totals of one venue or artist, from its counter
+  counts, count_owner, _ = SHOW_COUNTS[model]
+  row = db.session.execute(
+    select(upcoming_count(model, now), counts.upcoming + counts.past).where(count_owner == owner_id)
+  ).one_or_none()
+  if row is None:
+    return 0, 0
+
+  upcoming, total = row
+  return upcoming, total - upcoming
+
+def add_show_count(show, now):
+  # Counts a new show for its venue and artist, in the caller's transaction.
+  # The counter row is created with the venue's (or artist's) first show.
+  upcoming = show.start_time > now
+  for model, owner_id in ((Venue, show.venue_id), (Artist, show.artist_id)):
+    counts, count_owner, _ = SHOW_COUNTS[model]
+    values = {"upcoming": counts.upcoming + 1} if upcoming else {"past": counts.past + 1}
+    if upcoming:
+      values["next_show"] = case((or_(counts.next_show.is_(None), counts.next_show > show.start_time), show.start_time),
+                                 else_=counts.next_show)
+    updated = db.session.execute(update(counts).where(count_owner == owner_id).values(values)).rowcount
+    if not updated:
+      db.session.execute(insert(counts).values({count_owner.key: owner_id,
+                                                   "upcoming": int(upcoming),
+                                                   "past": int(not upcoming),
+                                                   "next_show": show.start_time if upcoming else None}))
+
+def refresh_show_counts(model, ids=None, now=None):
+  # Recounts the counters of the given venue (or artist) ids, or of all of them,
+  # from Show: one DELETE and one INSERT ... SELECT, in the caller's transaction.
+  counts, count_owner, show_owner = SHOW_COUNTS[model]
+  now = now or datetime.now()
+  if ids is not None:
+    ids = list(ids)
+    if not ids:
+      return
+
+  clear = delete(counts)
+  aggregate = select(show_owner,
+                     func.count(case((Show.start_time > now, Show.id))),
+                     func.count(case((Show.start_time <= now, Show.id))),
+                     func.min(case((Show.start_time > now, Show.start_time)))) \
+    .group_by(show_owner)
+  if ids is not None:
+    clear = clear.where(count_owner.in_(ids))
+    aggregate = aggregate.where(show_owner.in_(ids))
+
+  db.session.execute(clear)
+  db.session.execute(insert(counts).from_select([count_owner.key, 'upcoming', 'past', 'next_show'], aggregate))
+
+def delete_returning(statement, *columns):
+  # Runs a DELETE and returns the given columns of the deleted rows, in the same
+  # round trip on databases with DELETE ... RETURNING
+  if db.engine.dialect.delete_returning:
+    return db.session.execute(statement.returning(*columns)).all()
+  rows = db.session.execute(select(*columns).where(statement.whereclause)).all()
+  db.session.execute(statement)
+  return rows
+
+def delete_owner(model, owner_id):
+  # Deletes a venue (or artist) with its shows, genres and show counter, one
+  # DELETE per table and children first, in the caller's transaction. Returns the
+  # name of the deleted venue (None if there was none), the ids of the artists
+  # (or venues) that lost shows, and the number of rows deleted per table.
+  if model is Venue:
+    genre_model, genre_owner, counterpart_column = VenueGenre, VenueGenre.venue_id, Show.artist_id
+  else:
+    genre_model, genre_owner, counterpart_column = ArtistGenre, ArtistGenre.artist_id, Show.venue_id
+  counts, count_owner, show_owner = SHOW_COUNTS[model]
+
+  shows = delete_returning(delete(Show).where(show_owner == owner_id), counterpart_column)
+  deleted = {
+    'Show': len(shows),
+    genre_model.__tablename__: db.session.execute(delete(genre_model).where(genre_owner == owner_id)).rowcount,
+    counts.__tablename__: db.session.execute(delete(counts).where(count_owner == owner_id)).rowcount
+  }
+  owner = delete_returning(delete(model).where(model.id == owner_id), model.name)
+  deleted[model.__tablename__] = len(owner)
+
+  return (owner[0].name if owner else None), {id for id, in shows}, deleted
+
+def refresh_stale_show_counts(now=None):
+  # Moves the shows that have started since the last refresh from upcoming to
+  # past. Returns the cache tags of the venues and artists refreshed.
+  now = now or datetime.now()
+  refreshed = []
+  for model, (counts, count_owner, _) in SHOW_COUNTS.items():
+    ids = [id for id, in db.session.execute(select(count_owner).where(counts.next_show <= now))]
+    refresh_show_counts(model, ids, now)
+    refreshed.extend(f'{model.__tablename__.lower()}:{id}' for id in ids)
+  return refreshed
+
+def detail_shows(owner_column, owner_id, counterpart, now, upcoming=True, page=None):
+  # Shows of one venue (or artist) joined to the artist (or venue) playing them,
+  # so name and image come back with the show in the same statement.
+  # Upcoming shows are returned soonest first; past shows latest first, one page at a time.
+  counterpart_column = Show.artist_id if counterpart is Artist else Show.venue_id
+  prefix = counterpart.__tablename__.lower()
+
+  query = db.session.query(
+      Show.start_time,
+      counterpart.id,
+      counterpart.name,
+      counterpart.image_link
+    ).join(counterpart, counterpart.id == counterpart_column) \
+    .filter(owner_column == owner_id)
+
+  if upcoming:
+    query = query.filter(Show.start_time > now).order_by(Show.start_time, Show.id)
+  else:
+    query = query.filter(Show.start_time <= now).order_by(Show.start_time.desc(), Show.id.desc())
+
+  if page is not None:
+    per_page = app.config['PAST_SHOWS_PER_PAGE']
+    query = query.limit(per_page).offset((page - 1) * per_page)
+
+  return [{
+      prefix + "_id": row.id,
+      prefix + "_name": row.name,
+      prefix + "_image_link": row.image_link,
+      "start_time": row.start_time
+    } for row in query]
+
+def shows_page(after=None, start=None, end=None, limit=None):
+  # One page of shows ordered by (start_time, id), joined to venue and artist in a
+  # single statement. Pages are addressed by the (start_time, id) of the last show
+  # of the previous page (keyset pagination), so every page costs the same whatever
+  # its position. One extra row is fetched to know whether a next page exists.
+  limit = min(limit or app.config['SHOWS_PER_PAGE'], app.config['SHOWS_MAX_PER_PAGE'])
+
+  query = db.session.query(
+      Show.id,
+      Show.version,
+      Show.start_time,
+      Show.venue_id,
+      Venue.name.label('venue_name'),
+      Venue.version.label('venue_version'),
+      Show.artist_id,
+      Artist.name.label('artist_name'),
+      Artist.image_link.label('artist_image_link'),
+      Artist.version.label('artist_version')
+    ).join(Venue, Venue.id == Show.venue_id) \
+    .join(Artist, Artist.id == Show.artist_id)
+
+  if start is not None:
+    query = query.filter(Show.start_time >= start)
+  if end is not None:
+    query = query.filter(Show.start_time < end)
+  if after is not None:
+    query = query.filter(tuple_(Show.start_time, Show.id) > tuple_(*after))
+
+  rows = query.order_by(Show.start_time, Show.id).limit(limit + 1).all()
+
+  next_cursor = None
+  if len(rows) > limit:
+    rows = rows[:limit]
+    next_cursor = format_cursor(rows[-1].start_time, rows[-1].id)
+
+  # the ids and versions key the cached tile of each show
+  data = [{
+      "id": row.id,
+      "version": row.version,
+      "venue_id": row.venue_id,
+      "venue_name": row.venue_name,
+      "venue_version": row.venue_version,
+      "artist_id": row.artist_id,
+      "artist_version": row.artist_version,
+      "artist_name": row.artist_name,
+      "artist_image_link": row.artist_image_link,
+      "start_time": row.start_time
+    } for row in rows]
+
+  return data, next_cursor
+
+def format_cursor(start_time, show_id):
+  return f'{start_time.isoformat()}_{show_id}'
+
+def parse_cursor(value):
+  # raises ValueError on malformed cursors so request.args.get(type=...) ignores them
+  start_time, show_id = value.rsplit('_', 1)
+  return datetime.fromisoformat(start_time), int(show_id)
+
+def parse_date(value):
+  return datetime.strptime(value, '%Y-%m-%d')
+
+def show_end(start_time, duration):
+  return start_time + timedelta(minutes=duration)
+
+def booked_shows(show_owner, start, end, owner_ids=None):
+  # (owner id, start, end) of the shows overlapping [start, end) of the venues (or
+  # artists, by show_owner) in owner_ids, a list or a select of ids, or of all of
+  # them. No show lasts longer than MAX_SHOW_DURATION, so only those starting in
+  # (start - MAX_SHOW_DURATION, end) can overlap: one range of the (owner,
+  # start_time) index per owner, or of the (start_time, id) index.
+  statement = select(show_owner, Show.start_time, Show.duration) \
+    .where(Show.start_time > start - timedelta(minutes=MAX_SHOW_DURATION), Show.start_time < end)
+  if owner_ids is not None:
+    statement = statement.where(show_owner.in_(owner_ids))
+
+  shows = [(owner_id, show_start, show_end(show_start, duration))
+           for owner_id, show_start, duration in db.session.execute(statement)]
+  return [(owner_id, show_start, show_finish) for owner_id, show_start, show_finish in shows if show_finish > start]
+
+def show_conflicts(venue_id, artist_id, start, duration):
+  # The shows of the venue or of the artist that overlap a new show, as
+  # (start, end, show id, venue id, artist id) in time order, from one range of
+  # each of the two (owner, start_time) indexes.
+  end = show_end(start, duration)
+  lookback = start - timedelta(minutes=MAX_SHOW_DURATION)
+  columns = (Show.id, Show.venue_id, Show.artist_id, Show.start_time, Show.duration)
+  statement = union_all(
+    select(*columns).where(Show.venue_id == venue_id, Show.start_time > lookback, Show.start_time < end),
+    select(*columns).where(Show.artist_id == artist_id, Show.start_time > lookback, Show.start_time < end))
+
+  shows = {(row.start_time, show_end(row.start_time, row.duration), row.id, row.venue_id, row.artist_id)
+           for row in db.session.execute(statement)}
+  return sorted(overlapping(shows, start, end))
+
+def batch_show_conflicts(rows):
+  # The errors of each of a batch of new show rows, or None: a show conflicts
+  # with the booked shows of its venue or artist and with the earlier rows of
+  # the batch that do not conflict themselves. The booked shows are read once
+  # for the whole batch, from the (owner, start_time) indexes.
+  start = min(row['start_time'] for row in rows)
+  end = max(show_end(row['start_time'], row['duration']) for row in rows)
+  longest = timedelta(minutes=MAX_SHOW_DURATION)
+  booked = {}
+  for field, show_owner in (('venue_id', Show.venue_id), ('artist_id', Show.artist_id)):
+    booked[field] = {}
+    for owner_id, show_start, show_finish in booked_shows(show_owner, start, end, list({row[field] for row in rows})):
+      booked[field].setdefault(owner_id, []).append((show_start, show_finish))
+    for shows in booked[field].values():
+      shows.sort()
+
+  errors = []
+  for row in rows:
+    row_start, row_end = row['start_time'], show_end(row['start_time'], row['duration'])
+    error = None
+    for field, owner in (('venue_id', 'Venue'), ('artist_id', 'Artist')):
+      conflict = first_overlap(booked[field].get(row[field], []), row_start, row_end, longest)
+      if conflict is not None:
+        error = {field: [f'{owner} is already booked from {conflict[0]:%Y-%m-%d %H:%M} to {conflict[1]:%Y-%m-%d %H:%M}.']}
+        break
+    if error is None:
+      for field in booked:
+        insort(booked[field].setdefault(row[field], []), (row_start, row_end))
+    errors.append(error)
+  return errors
+
+def available_owners(model, start, end, city=None, state=None, genre=None, limit=None):
+  # Venues (or artists) with no show overlapping [start, end), in id order,
+  # optionally only those in a city and state or listed under a genre. One query
+  # reads who is booked around the range, another the first candidates: at most
+  # limit of them plus one per booked owner, since only those can be skipped.
+  location = []
+  if city:
+    location.append(model.city == city)
+  if state:
+    location.append(model.state == state)
+  criteria = location + ([genre_filter(model, genre)] if genre else [])
+
+  # A city's few venues are looked up one by one in the (owner, start_time)
+  # index; otherwise reading every show of the range from the (start_time, id)
+  # index is cheaper than probing thousands of owners.
+  _, _, show_owner = SHOW_COUNTS[model]
+  candidates = select(model.id).where(*location) if location else None
+  busy = {owner_id for owner_id, _, _ in booked_shows(show_owner, start, end, candidates)}
+
+  statement = select(model.id, model.name, model.city, model.state).where(*criteria).order_by(model.id)
+  if limit is not None:
+    statement = statement.limit(limit + len(busy))
+  available = [{"id": row.id, "name": row.name, "city": row.city, "state": row.state}
+               for row in db.session.execute(statement) if row.id not in busy]
+  return available[:limit]
+
+def owner_free_slots(model, owner_id, start, end, length=timedelta(0)):
+  # the gaps of at least length between the shows of a venue (or artist) within [start, end)
+  _, _, show_owner = SHOW_COUNTS[model]
+  busy = [(show_start, show_finish) for _, show_start, show_finish in booked_shows(show_owner, start, end, [owner_id])]
+  return free_slots(busy, start, end, length)
+
+def upcoming_show_counts(model, ids):
+  # number of upcoming shows of each of the given venue (or artist) ids, from their counters
+  if not ids:
+    return {}
+
+  return dict(db.session.execute(upcoming_counts_statement(model, ids)).all())
+
+def upcoming_counts_statement(model, ids):
+  _, count_owner, _ = SHOW_COUNTS[model]
+  return select(count_owner, upcoming_count(model, datetime.now())).where(count_owner.in_(ids))
+
+_name_indexes = {}
+_name_generations = {}
+_name_indexes_lock = threading.Lock()
+
+def name_generation(model):
+  # (number of rows, latest updated_at) of the venues (or artists): it moves with
+  # every create, edit and delete, whichever process or script made it. Each
+  # part is answered from an index.
+  return tuple(db.session.execute(select(
+    select(func.count(model.id)).scalar_subquery(),
+    select(func.max(model.updated_at)).scalar_subquery())).one())
+
+def name_index(model):
+  # In-process search and suggestion index over venue or artist names, built on
+  # first use. Before each use it is brought up to date with the database: the
+  # rows updated since the last check are (re)added, and when the counts still
+  # differ, the rows deleted meanwhile are removed.
+  generation = name_generation(model)
+  with _name_indexes_lock:
+    index = _name_indexes.get(model)
+    if index is None:
+      index = _name_indexes[model] = NameIndex(db.session.query(model.id, model.name))
+    elif _name_generations[model] != generation:
+      _, checked_until = _name_generations[model]
+      changed = db.session.query(model.id, model.name)
+      if checked_until is not None:
+        changed = changed.filter(model.updated_at >= checked_until)
+      for id, name in changed:
+        index.add(id, name)
+      count, _ = generation
+      if len(index) != count:
+        index.retain({id for id, in db.session.query(model.id)})
+    _name_generations[model] = generation
+  return index
+
+def index_name(model, id, name):
+  # keep an already built name index in step with a create or edit
+  if model in _name_indexes:
+    _name_indexes[model].add(id, name)
+
+def unindex_name(model, id):
+  if model in _name_indexes:
+    _name_indexes[model].remove(id)
+
+def escape_like(term):
+  return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def search_names(model, search_term, genre=None):
+  # Case-insensitive partial match on name, best matches first, optionally only
+  # among those listed under genre. On Postgres the ILIKE is served by the pg_trgm
+  # index on name; other databases use the in-process name index. Returns the
+  # total number of matches and at most SEARCH_RESULTS_LIMIT (id, name) pairs.
+  if db.engine.dialect.name != 'postgresql':
+    within = None
+    if genre:
+      within = {id for id, in db.session.execute(select(model.id).where(genre_filter(model, genre)))}
+    return name_index(model).search(search_term, app.config['SEARCH_RESULTS_LIMIT'], within=within)
+
+  return search_matches(db.session.execute(search_statement(model, search_term, genre)).all())
+
+def search_statement(model, search_term, genre=None):
+  # the Postgres search: ILIKE through the trigram index, ranked by similarity
+  term = search_term.lower()
+  lowered_name = func.lower(model.name)
+  statement = select(model.id, model.name, func.count().over().label('total')) \
+    .where(model.name.ilike(f'%{escape_like(search_term)}%', escape='\\'))
+
+  if genre:
+    statement = statement.where(genre_filter(model, genre))
+
+  return statement.order_by(case((lowered_name == term, 0),
+                                 (lowered_name.like(f'{escape_like(term)}%', escape='\\'), 1),
+                                 else_=2),
+                            func.similarity(model.name, search_term).desc(),
+                            model.name,
+                            model.id) \
+    .limit(app.config['SEARCH_RESULTS_LIMIT'])
+
+def search_matches(rows):
+  return (rows[0].total if rows else 0), [(row.id, row.name) for row in rows]
+
+def search_results(model, search_term, genre=None):
+  count, matches = search_names(model, search_term, genre)
+  num_upcoming_shows = upcoming_show_counts(model, [id for id, _ in matches])
+  return search_data(count, matches, num_upcoming_shows)
+
+def search_data(count, matches, num_upcoming_shows):
+  return {
+    "count": count,
+    "data": [{
+      "id": id,
+      "name": name,
+      "num_upcoming_shows": num_upcoming_shows.get(id, 0)
+    } for id, name in matches]
+  }
+
+city_centroids = CityCentroids()
+
+def venue_location(latitude, longitude, city, state):
+  # The coordinates and geohash stored for a venue: its own coordinates when it
+  # has both, else the centre of its city from the bundled table, else none.
+  if latitude is None or longitude is None:
+    latitude, longitude = city_centroids.get(city, state) or (None, None)
+  return {
+    "latitude": latitude,
+    "longitude": longitude,
+    "geohash": geohash(latitude, longitude) if latitude is not None else None
+  }
+
+def own_coordinates(venue):
+  # the venue's (latitude, longitude), or (None, None) when it has none or they
+  # are only the centre of its city
+  if venue.latitude is None or (venue.latitude, venue.longitude) == city_centroids.get(venue.city, venue.state):
+    return None, None
+  return venue.latitude, venue.longitude
+
+# The venue's point as a PostGIS geography, the expression the GiST index is on
+VENUE_GEOGRAPHY = func.geography(func.ST_SetSRID(func.ST_MakePoint(Venue.longitude, Venue.latitude), 4326))
+NEARBY_COLUMNS = (Venue.id, Venue.name, Venue.city, Venue.state, Venue.latitude, Venue.longitude)
+
+_postgis = {}
+
+def has_postgis():
+  # whether the database has the PostGIS extension, looked up once
+  if 'installed' not in _postgis:
+    _postgis['installed'] = db.engine.dialect.name == 'postgresql' and db.session.execute(
+      text("SELECT 1 FROM pg_extension WHERE extname = 'postgis'")).first() is not None
+  return _postgis['installed']
+
+def venues_near(latitude, longitude, radius_km=None, limit=None):
+  # Venues within radius_km (or NEARBY_MAX_RADIUS_KM) of a point, nearest first,
+  # at most limit of them. The geohash search starts 1 km around the point and
+  # widens until it has found limit venues, so that in a dense city it reads
+  # the venues of a few blocks rather than of the whole radius.
+  limit = api_limit(limit)
+  radius_km = radius_km or app.config['NEARBY_MAX_RADIUS_KM']
+  if has_postgis():
+    return postgis_venues_near(latitude, longitude, radius_km, limit)
+
+  searched_km = min(1, radius_km)
+  while True:
+    venues = geohash_venues_near(latitude, longitude, searched_km, limit)
+    if len(venues) >= limit or searched_km >= radius_km:
+      return venues
+    searched_km = min(searched_km * 4, radius_km)
+
+def geohash_venues_near(latitude, longitude, radius_km, limit):
+  # One range of the geohash index per cell covering the circle. The database
+  # drops the venues of those cells outside the circle's bounding box, the
+  # exact distance is computed for the rest.
+  cells = []
+  for low, high in map(prefix_range, covering_prefixes(latitude, longitude, radius_km)):
+    cells.append(and_(Venue.geohash >= low, Venue.geohash < high) if high else Venue.geohash >= low)
+  south, north, west, east = bounding_box(latitude, longitude, radius_km)
+  statement = select(*NEARBY_COLUMNS).where(or_(*cells), Venue.latitude.between(south, north))
+  if -180 <= west and east <= 180:
+    statement = statement.where(Venue.longitude.between(west, east))
+
+  nearby = []
+  for row in db.session.execute(statement):
+    distance = distance_km(latitude, longitude, row.latitude, row.longitude)
+    if distance <= radius_km:
+      nearby.append((distance, row.id, row))
+  nearby.sort()
+  return [nearby_venue(row, distance) for distance, _, row in nearby[:limit]]
+
+def postgis_venues_near(latitude, longitude, radius_km, limit):
+  # ST_DWithin and the <-> (nearest first) ordering both walk the GiST index
+  origin = func.geography(func.ST_SetSRID(func.ST_MakePoint(longitude, latitude), 4326))
+  statement = select(*NEARBY_COLUMNS, func.ST_Distance(VENUE_GEOGRAPHY, origin).label('distance')) \
+    .where(func.ST_DWithin(VENUE_GEOGRAPHY, origin, radius_km * 1000)) \
+    .order_by(VENUE_GEOGRAPHY.op('<->')(origin)) \
+    .limit(limit)
+  return [nearby_venue(row, row.distance / 1000) for row in db.session.execute(statement)]
+
+def nearby_venue(row, distance):
+  return {
+    "id": row.id,
+    "name": row.name,
+    "city": row.city,
+    "state": row.state,
+    "latitude": row.latitude,
+    "longitude": row.longitude,
+    "distance_km": round(distance, 3)
+  }
+
+def export_statements(kind, since=None):
+  # The rows of an export in id order, changed at or after since if given, and
+  # for venues and artists their genres, in the same (owner id) order.
+  if kind == 'shows':
+    statement = select(Show.id, Show.venue_id, Venue.name.label('venue_name'),
+                       Show.artist_id, Artist.name.label('artist_name'),
+                       Show.start_time, Show.duration, Show.updated_at) \
+      .join(Venue, Show.venue_id == Venue.id) \
+      .join(Artist, Show.artist_id == Artist.id) \
+      .order_by(Show.id)
+    if since:
+      statement = statement.where(Show.updated_at >= since)
+    return statement, None
+
+  model, genre_model, owner_column = {
+    'venues': (Venue, VenueGenre, VenueGenre.venue_id),
+    'artists': (Artist, ArtistGenre, ArtistGenre.artist_id),
+  }[kind]
+  statement = select(*[column for column in model.__table__.c if column.name != 'version']).order_by(model.id)
+  genre_statement = select(owner_column, genre_model.genre).order_by(owner_column, genre_model.genre)
+  if since:
+    statement = statement.where(model.updated_at >= since)
+    genre_statement = genre_statement.join(model, owner_column == model.id).where(model.updated_at >= since)
+  return statement, genre_statement
+
+def export_chunks(kind, format, since=None):
+  # A whole table as CSV or JSONL text chunks. Rows are read from a server-side
+  # cursor EXPORT_BATCH_SIZE at a time, on a connection of the generator's own
+  # that is closed when the export finishes or the client goes away.
+  statement, genre_statement = export_statements(kind, since)
+  write_chunks, _ = EXPORT_FORMATS[format]
+  columns = [column.name for column in statement.selected_columns]
+  if genre_statement is not None:
+    columns.append('genres')
+  engine = read_engine(db)
+  batch_size = app.config['EXPORT_BATCH_SIZE']
+
+  def generate():
+    with engine.connect() as connection:
+      connection = connection.execution_options(yield_per=batch_size)
+      rows = connection.execute(statement)
+      if genre_statement is not None:
+        rows = with_genres(rows, connection.execute(genre_statement))
+      yield from write_chunks(columns, rows, batch_size)
+  return generate()
+
+def parse_since(value):
+  # ISO date or date and time
+  return datetime.fromisoformat(value)
+
+# Fields of the /api/ endpoints. Columns are selected only when asked for;
+# genres and show counts take one more query for the whole page.
+API_COLUMNS = {
+  model: {column.name: column for column in model.__table__.c if column.name != 'version'}
+  for model in (Venue, Artist)
+}
+API_SHOW_COLUMNS = {
+  "id": Show.id,
+  "start_time": Show.start_time,
+  "duration": Show.duration,
+  "venue_id": Show.venue_id,
+  "venue_name": Venue.name,
+  "venue_image_link": Venue.image_link,
+  "artist_id": Show.artist_id,
+  "artist_name": Artist.name,
+  "artist_image_link": Artist.image_link,
+  "updated_at": Show.updated_at
+}
+
+def api_limit(limit):
+  if limit is None or limit < 1:
+    limit = app.config['API_PAGE_SIZE']
+  return min(limit, app.config['API_MAX_PAGE_SIZE'])
+
+def owner_genres(model, ids):
+  # genres of each of the given venue (or artist) ids, in one query
+  if model is Venue:
+    owner_column, genre_column = VenueGenre.venue_id, VenueGenre.genre
+  else:
+    owner_column, genre_column = ArtistGenre.artist_id, ArtistGenre.genre
+  genres = {}
+  if ids:
+    for owner_id, genre in db.session.execute(
+        select(owner_column, genre_column).where(owner_column.in_(ids)).order_by(owner_column, genre_column)):
+      genres.setdefault(owner_id, []).append(genre)
+  return genres
+
+def api_owners(model, fields, after=None, limit=None, genre=None, owner_id=None):
+  # One page of venues (or artists) in id order, as dicts of the requested
+  # fields, read as Core rows without building ORM objects. Pages are
+  # addressed by the id of the last row of the previous page.
+  limit = api_limit(limit)
+  columns = API_COLUMNS[model]
+  selected = ['id'] + [field for field in fields if field in columns and field != 'id']
+  statement = select(*[columns[field].label(field) for field in selected]).order_by(model.id)
+
+  if owner_id is not None:
+    statement = statement.where(model.id == owner_id)
+  if after is not None:
+    statement = statement.where(model.id > after)
+  if genre:
+    statement = statement.where(genre_filter(model, genre))
+
+  rows = db.session.execute(statement.limit(limit + 1)).all()
+  next_cursor = None
+  if len(rows) > limit:
+    rows = rows[:limit]
+    next_cursor = str(rows[-1].id)
+
+  records = [dict(zip(selected, row)) for row in rows]
+  ids = [record['id'] for record in records]
+  if 'genres' in fields:
+    genres = owner_genres(model, ids)
+    for record in records:
+      record['genres'] = genres.get(record['id'], [])
+  if 'num_upcoming_shows' in fields:
+    counts = upcoming_show_counts(model, ids)
+    for record in records:
+      record['num_upcoming_shows'] = counts.get(record['id'], 0)
+
+  return [{field: record[field] for field in fields} for record in records], next_cursor
+
+def api_shows(fields, after=None, start=None, end=None, limit=None, venue_id=None, artist_id=None):
+  # One page of shows ordered by (start_time, id) like shows_page, joined to
+  # the venue or artist only when one of their fields is asked for.
+  limit = api_limit(limit)
+  selected = list(dict.fromkeys(['id', 'start_time'] + fields))
+  statement = select(*[API_SHOW_COLUMNS[field].label(field) for field in selected]).select_from(Show)
+
+  if any(field.startswith('venue_') and field != 'venue_id' for field in selected):
+    statement = statement.join(Venue, Venue.id == Show.venue_id)
+  if any(field.startswith('artist_') and field != 'artist_id' for field in selected):
+    statement = statement.join(Artist, Artist.id == Show.artist_id)
+  if venue_id is not None:
+    statement = statement.where(Show.venue_id == venue_id)
+  if artist_id is not None:
+    statement = statement.where(Show.artist_id == artist_id)
+  if start is not None:
+    statement = statement.where(Show.start_time >= start)
+  if end is not None:
+    statement = statement.where(Show.start_time < end)
+  if after is not None:
+    statement = statement.where(tuple_(Show.start_time, Show.id) > tuple_(*after))
+
+  rows = db.session.execute(statement.order_by(Show.start_time, Show.id).limit(limit + 1)).all()
+  next_cursor = None
+  if len(rows) > limit:
+    rows = rows[:limit]
+    next_cursor = format_cursor(rows[-1].start_time, rows[-1].id)
+
+  records = [dict(zip(selected, row)) for row in rows]
+  return [{field: record[field] for field in fields} for record in records], next_cursor
+
+#----------------------------------------------------------------------------#
+# Cache.
+#----------------------------------------------------------------------------#
+
+# tags whose versions are moved per statement, well under SQLite's variable limit
+PAGE_VERSION_BATCH = 500
+
+def pages_changed(*tags):
+  # Moves the version rows of the tags (see PageVersion) and drops the cached
+  # pages depending on them. Called once the change is committed, so no ETag
+  # built from the new versions can go out with a page of the old data. Tags
+  # are bumped in sorted order, so concurrent writers lock rows in the same order.
+  tags = sorted(set(tags))
+  upsert = postgresql_insert if db.engine.dialect.name == 'postgresql' else sqlite_insert
+  for offset in range(0, len(tags), PAGE_VERSION_BATCH):
+    statement = upsert(PageVersion).values([{"tag": tag, "version": 1} for tag in tags[offset:offset + PAGE_VERSION_BATCH]])
+    db.session.execute(statement.on_conflict_do_update(index_elements=['tag'],
+                                                       set_={"version": PageVersion.version + 1}))
+  db.session.commit()
+  response_cache.invalidate(*tags)
+
+def invalidate_venue_pages(venue_id, artist_ids=None):
+  # A venue appears on its own page, on /venues and /shows, and on the page of
+  # every artist who has a show there.
+  if artist_ids is None:
+    artist_ids = [id for id, in db.session.query(Show.artist_id).filter(Show.venue_id == venue_id).distinct()]
+  pages_changed('venues', 'shows', f'venue:{venue_id}', *(f'artist:{id}' for id in artist_ids))
+
+def invalidate_artist_pages(artist_id, venue_ids=None):
+  # An artist appears on its own page, on /artists and /shows, and on the page of
+  # every venue where it has a show; /venues counts its shows.
+  if venue_ids is None:
+    venue_ids = [id for id, in db.session.query(Show.venue_id).filter(Show.artist_id == artist_id).distinct()]
+  pages_changed('artists', 'venues', 'shows', f'artist:{artist_id}', *(f'venue:{id}' for id in venue_ids))
+
+#----------------------------------------------------------------------------#
+# Validators.
+#----------------------------------------------------------------------------#
+
+# Each function answers, when the page is not cached, what its ETag would be
+# without running the page's queries: one statement reads the version rows of the tags the page is cached
+# under (see pages_changed), by primary key. Pages splitting shows into upcoming
+# and past also depend on the clock, so the start time of the latest show to
+# have begun, one index lookup, moves their ETag when a show becomes past. No
+# Last-Modified is sent: no modification time moves when a row is deleted or a show starts.
+
+def page_versions(tags, *values):
+  # the version of each tag, 0 before its first write, followed by the given values
+  versions = [func.coalesce(select(PageVersion.version).where(PageVersion.tag == tag).scalar_subquery(), 0)
+              for tag in tags]
+  return tuple(db.session.execute(select(*versions, *values)).one())
+
+def page_validators(*values):
+  return hashlib.sha1(repr((request.full_path,) + values).encode()).hexdigest()
+
+def last_started(*criteria):
+  # start time of the latest show, among those matching criteria, to have begun
+  return select(Show.start_time) \
+    .where(Show.start_time <= datetime.now(), *criteria) \
+    .order_by(Show.start_time.desc()) \
+    .limit(1) \
+    .scalar_subquery()
+
+def detail_validators(model, model_id, owner_column):
+  # the page of a venue (or artist) that does not exist is not validated, the view 404s
+  tag = f'{model.__tablename__.lower()}:{model_id}'
+  version, found, started = page_versions([tag],
+                                          select(model.id).where(model.id == model_id).scalar_subquery(),
+                                          last_started(owner_column == model_id))
+  if found is None:
+    return None
+
+  return page_validators(version, started)
+
+def venue_validators(venue_id):
+  return detail_validators(Venue, venue_id, Show.venue_id)
+
+def artist_validators(artist_id):
+  return detail_validators(Artist, artist_id, Show.artist_id)
+
+def venues_validators():
+  # lists upcoming show counts
+  return page_validators(*page_versions(['venues'], last_started()))
+
+def artists_validators():
+  return page_validators(*page_versions(['artists']))
+
+def shows_validators():
+  return page_validators(*page_versions(['shows']))
+
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
@@ -105,45 +1010,10 @@ def index():
 #  Venues
 #  ----------------------------------------------------------------
 @app.route('/venues')
+@response_cache.cached('venues', validator=venues_validators)
 def venues():
-  
-  data =[]
-
-  all_venues = Venue.query.all()
-  
-  # Venue locations are grouped by city and state
-  venues_in_citystate = set()
-  for citystate in all_venues:
-    venues_in_citystate.add((citystate.city, citystate.state))
-  
-  # add all the cities and state first
-  for venue_locations in venues_in_citystate:
-    data.append({
-      "city": venue_locations[0],
-      "state": venue_locations[1],
-      "venues": []
-    })
-  
-  # loop thru each venues per cities and state and add venue data in data along with number of shows per venue locations
-  for venue in all_venues:
-    num_upcoming_shows = 0   # initiare the counter
-    shows_per_venue = Show.query.filter_by(venue_id=venue.id).all() # get all the shows for a venue
-    
-    # Increment number of shows when show start time is greater than current time
-    for show in shows_per_venue:
-      if show.start_time > datetime.now():
-        num_upcoming_shows += 1
-    
-    # add each record in the data to return the output
-    for venue_data in data:
-      if venue.city == venue_data['city'] and venue.state == venue_data['state']:
-        venue_data['venues'].append({
-          "id": venue.id,
-          "name": venue.name,
-          "num_upcoming_shows": num_upcoming_shows
-        })
-
-  return render_template('pages/venues.html', areas=data)
+  genre = request.args.get('genre')
+  return render_template('pages/venues.html', areas=venue_areas(genre), genres=genre_choices, genre=genre)
 
 @app.route('/venues/search', methods=['POST'])
 def search_venues():
@@ -152,64 +1022,29 @@ def search_venues():
   # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
   
   search_term = request.form.get('search_term', '')
-  all_venues = Venue.query.filter(Venue.name.ilike(f'%{search_term}%')).all()
-
-  response = {
-    "count": len(all_venues),
-    "data": []
-  }
-
-  for venue in all_venues:
-    num_upcoming_shows = 0   # initiare the counter
-    shows_per_venue = Show.query.filter_by(venue_id=venue.id).all() # get all the shows for a venue
-    
-    # Increment number of shows when show start time is greater than current time
-    for show in shows_per_venue:
-      if show.start_time > datetime.now():
-        num_upcoming_shows += 1
-    
-    # add each record in the data to return the output
-    response['data'].append({
-          "id": venue.id,
-          "name": venue.name,
-          "num_upcoming_shows": num_upcoming_shows
-      })
+  genre = request.values.get('genre')
+  response = search_results(Venue, search_term, genre)
 
   return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
 
 @app.route('/venues/<int:venue_id>')
+@response_cache.cached('venue:{venue_id}', validator=venue_validators)
 def show_venue(venue_id):
   # shows the venue page with the given venue_id
-  # replace with real venue data from the venues table, using venue_id
-  
   venue = Venue.query.filter_by(id=venue_id).one_or_none()
-  all_shows = Show.query.filter_by(venue_id=venue_id).all()
+  if venue is None:
+    abort(404)
 
-  past_shows = []
-  upcoming_shows = []
-  
-  # Get the past and upcoming shows
-  for show in all_shows:
-    if show.start_time > datetime.now():
-      upcoming_shows.append({
-        "artist_id": show.artist_id,
-        "artist_name": Artist.query.filter_by(id=show.artist_id).first().name,
-        "artist_image_link": Artist.query.filter_by(id=show.artist_id).first().image_link,
-        "start_time": format_datetime(str(show.start_time))
-      })
-    else:
-      past_shows.append({
-        "artist_id": show.artist_id,
-        "artist_name": Artist.query.filter_by(id=show.artist_id).first().name,
-        "artist_image_link": Artist.query.filter_by(id=show.artist_id).first().image_link,
-        "start_time": format_datetime(str(show.start_time))
-      })
+  now = datetime.now()
+  upcoming_shows_count, past_shows_count = show_counts(Venue, venue_id, now)
+  upcoming_shows = detail_shows(Show.venue_id, venue_id, Artist, now)
+  past_shows = detail_shows(Show.venue_id, venue_id, Artist, now, upcoming=False, page=1)
 
   # add each record in data and return
   data = {
         "id": venue.id,
         "name": venue.name,
-        "genres": venue.genres,
+        "genres": list(venue.genres),
         "address": venue.address,
         "city": venue.city,
         "state": venue.state,
@@ -221,12 +1056,21 @@ def show_venue(venue_id):
         "image_link": venue.image_link,
         "past_shows": past_shows,
         "upcoming_shows": upcoming_shows,
-        "past_shows_count": len(past_shows),
-        "upcoming_shows_count": len(upcoming_shows)
+        "past_shows_count": past_shows_count,
+        "upcoming_shows_count": upcoming_shows_count
     }
   
   return render_template('pages/show_venue.html', venue=data)
 
+@app.route('/venues/<int:venue_id>/past_shows')
+@response_cache.cached('venue:{venue_id}', validator=venue_validators)
+def show_venue_past_shows(venue_id):
+  # one more page of past shows for the "load more" button on the venue page
+  page = max(request.args.get('page', 1, type=int), 1)
+  past_shows = detail_shows(Show.venue_id, venue_id, Artist, datetime.now(), upcoming=False, page=page)
+
+  return render_template('pages/show_tiles.html', shows=past_shows, counterpart='artist')
+
 #  Create Venue
 #  ----------------------------------------------------------------
 
@@ -258,6 +1102,9 @@ def create_venue_submission():
 
     new_seeking_description = form.seeking_description.data
     new_image_link = form.image_link.data
+    if not all([form.latitude.validate(form), form.longitude.validate(form)]):
+      flash('Error! ' + ' '.join(form.latitude.errors + form.longitude.errors))
+      return render_template('forms/new_venue.html', form=form)
 
     new_venue = Venue(name=new_name,
                       genres=new_genres,
@@ -269,10 +1116,13 @@ def create_venue_submission():
                       facebook_link=new_facebook_link,
                       seeking_talent=new_seeking_talent,
                       seeking_description=new_seeking_description,
-                      image_link=new_image_link)
+                      image_link=new_image_link,
+                      **venue_location(form.latitude.data, form.longitude.data, new_city, new_state))
     
     db.session.add(new_venue)
     db.session.commit()
+    index_name(Venue, new_venue.id, new_venue.name)
+    pages_changed('venues')
 
     # on successful db insert, flash success
     flash('Venue ' + request.form['name'] + ' was successfully listed!')
@@ -290,12 +1140,14 @@ def create_venue_submission():
 def edit_venue(venue_id):
   form = VenueForm()
   venue = Venue.query.filter_by(id=venue_id).first()
+  # shows the venue's own coordinates: fields submitted empty place it at the centre of its city
+  form.latitude.data, form.longitude.data = own_coordinates(venue)
  
   # populate form with values from venue with ID <venue_id>
   venue={
     "id": venue.id,
     "name": venue.name,
-    "genres": venue.genres,
+    "genres": list(venue.genres),
     "address": venue.address,
     "city": venue.city,
     "state": venue.state,
@@ -315,6 +1167,9 @@ def edit_venue_submission(venue_id):
   # venue record with ID <venue_id> using the new attributes
   try:
     form = VenueForm()
+    if not all([form.latitude.validate(form), form.longitude.validate(form)]):
+      flash('Error! ' + ' '.join(form.latitude.errors + form.longitude.errors))
+      return redirect(url_for('edit_venue', venue_id=venue_id))
     venue = Venue.query.filter_by(id=venue_id).first()
     
     venue.name = form.name.data
@@ -333,8 +1188,13 @@ def edit_venue_submission(venue_id):
 
     venue.seeking_description = form.seeking_description.data
     venue.image_link = form.image_link.data
+    for field, value in venue_location(form.latitude.data, form.longitude.data, venue.city, venue.state).items():
+      setattr(venue, field, value)
+    venue.updated_at = datetime.utcnow()
 
     db.session.commit()
+    index_name(Venue, venue_id, venue.name)
+    invalidate_venue_pages(venue_id)
 
     # on successful db insert, flash success
     flash('Venue ' + request.form['name'] + ' was successfully updated!')
@@ -348,56 +1208,58 @@ def edit_venue_submission(venue_id):
 
   return redirect(url_for('show_venue', venue_id=venue_id))
 
-@app.route('/venues/<venue_id>', methods=['DELETE'])
+@app.route('/venues/<int:venue_id>', methods=['DELETE'])
 def delete_venue(venue_id):
-  # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
+  # Deletes the venue, its shows and genres with one DELETE statement per table
+  # and answers with the number of rows removed from each.
 
   # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
   # clicking that button delete it from the db then redirect the user to the homepage
   try:
-    # Get the venue to be deleted
-    venue = Venue.query.filter(Venue.id == venue_id).first()
-    venue_name = venue.name
-
-    # all shows for that venue need to be deleted as well
-    all_shows = Show.query.filter_by(venue_id=venue_id).all()
-
-    # delete first the venue
-    db.session.delete(venue)
-
-    # Loop thru each shows to delete
-    for show in all_shows:
-      db.session.delete(show)
+    venue_name, artist_ids, deleted = delete_owner(Venue, venue_id)
+    if venue_name is None:
+      db.session.rollback()
+      return jsonify({ 'success': False }), 404
 
+    # its artists lose the shows they played there
+    refresh_show_counts(Artist, artist_ids)
     db.session.commit()
+    unindex_name(Venue, venue_id)
+    invalidate_venue_pages(venue_id, artist_ids)
 
     flash('Venue ' + venue_name + ' was successfully deleted!')
-    flash('All shows for ' + venue_name + ' was successfully deleted!')
+    flash(f'All {deleted["Show"]} shows for ' + venue_name + ' were successfully deleted!')
   except:
     db.session.rollback()
-    flash('Error! Venue ' + venue_name + ' could not be deleted')
+    flash('Error! Venue could not be deleted')
     print(sys.exc_info())
+    return jsonify({ 'success': False }), 500
   finally:
     db.session.close()
-  return jsonify({ 'success': True })
+  return jsonify({ 'success': True, 'deleted': deleted })
 
 
 #  Artists
 #  ----------------------------------------------------------------
 @app.route('/artists')
+@response_cache.cached('artists', validator=artists_validators)
 def artists():
   
   data = []
+  genre = request.args.get('genre')
 
-  all_artists = Artist.query.all()
+  query = db.session.query(Artist.id, Artist.name, Artist.version)
+  if genre:
+    query = query.filter(genre_filter(Artist, genre))
 
-  for artist in all_artists:
+  for artist in query.order_by(Artist.id):
     data.append({
       "id": artist.id,
-      "name": artist.name
+      "name": artist.name,
+      "version": artist.version
     })
 
-  return render_template('pages/artists.html', artists=data)
+  return render_template('pages/artists.html', artists=data, genres=genre_choices, genre=genre)
 
 @app.route('/artists/search', methods=['POST'])
 def search_artists():
@@ -406,64 +1268,29 @@ def search_artists():
   # search for "band" should return "The Wild Sax Band".
   
   search_term = request.form.get('search_term', '')
-  all_artists = Artist.query.filter(Artist.name.ilike(f'%{search_term}%')).all()
-
-  response = {
-    "count": len(all_artists),
-    "data": []
-  }
-
-  for artist in all_artists:
-    num_upcoming_shows = 0   # initiare the counter
-    shows_per_artist = Show.query.filter_by(artist_id=artist.id).all() # get all the shows for a venue
-    
-    # Increment number of shows when show start time is greater than current time
-    for show in shows_per_artist:
-      if show.start_time > datetime.now():
-        num_upcoming_shows += 1
-    
-    # add each record in the data to return the output
-    response['data'].append({
-          "id": artist.id,
-          "name": artist.name,
-          "num_upcoming_shows": num_upcoming_shows
-      })
+  genre = request.values.get('genre')
+  response = search_results(Artist, search_term, genre)
 
   return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
 
 @app.route('/artists/<int:artist_id>')
+@response_cache.cached('artist:{artist_id}', validator=artist_validators)
 def show_artist(artist_id):
-  # shows the venue page with the given venue_id
-  # replace with real venue data from the venues table, using venue_id
-
+  # shows the artist page with the given artist_id
   artist = Artist.query.filter_by(id=artist_id).one_or_none()
-  all_shows = Show.query.filter_by(artist_id=artist_id).all()
-
-  past_shows = []
-  upcoming_shows = []
-
-  # Get all the upcoming and past shows
-  for show in all_shows:
-    if show.start_time > datetime.now():
-      upcoming_shows.append({
-        "venue_id": show.venue_id,
-        "venue_name": Venue.query.filter_by(id=show.venue_id).first().name,
-        "venue_image_link": Venue.query.filter_by(id=show.venue_id).first().image_link,
-        "start_time": format_datetime(str(show.start_time))
-      })
-    else:
-      past_shows.append({
-        "venue_id": show.venue_id,
-        "venue_name": Venue.query.filter_by(id=show.venue_id).first().name,
-        "venue_image_link": Venue.query.filter_by(id=show.venue_id).first().image_link,
-        "start_time": format_datetime(str(show.start_time))
-      })
+  if artist is None:
+    abort(404)
+
+  now = datetime.now()
+  upcoming_shows_count, past_shows_count = show_counts(Artist, artist_id, now)
+  upcoming_shows = detail_shows(Show.artist_id, artist_id, Venue, now)
+  past_shows = detail_shows(Show.artist_id, artist_id, Venue, now, upcoming=False, page=1)
 
   # add the record in the data and return
   data = {
         "id": artist.id,
         "name": artist.name,
-        "genres": artist.genres,
+        "genres": list(artist.genres),
         "city": artist.city,
         "state": artist.state,
         "phone": artist.phone,
@@ -471,12 +1298,45 @@ def show_artist(artist_id):
         "image_link": artist.image_link,
         "past_shows": past_shows,
         "upcoming_shows": upcoming_shows,
-        "past_shows_count": len(past_shows),
-        "upcoming_shows_count": len(upcoming_shows)
+        "past_shows_count": past_shows_count,
+        "upcoming_shows_count": upcoming_shows_count
     }
 
   return render_template('pages/show_artist.html', artist=data)
 
+@app.route('/artists/<int:artist_id>/past_shows')
+@response_cache.cached('artist:{artist_id}', validator=artist_validators)
+def show_artist_past_shows(artist_id):
+  # one more page of past shows for the "load more" button on the artist page
+  page = max(request.args.get('page', 1, type=int), 1)
+  past_shows = detail_shows(Show.artist_id, artist_id, Venue, datetime.now(), upcoming=False, page=page)
+
+  return render_template('pages/show_tiles.html', shows=past_shows, counterpart='venue')
+
+@app.route('/artists/<int:artist_id>', methods=['DELETE'])
+def delete_artist(artist_id):
+  # deletes the artist, its shows and genres like delete_venue
+  try:
+    artist_name, venue_ids, deleted = delete_owner(Artist, artist_id)
+    if artist_name is None:
+      db.session.rollback()
+      return jsonify({ 'success': False }), 404
+
+    refresh_show_counts(Venue, venue_ids)
+    db.session.commit()
+    unindex_name(Artist, artist_id)
+    invalidate_artist_pages(artist_id, venue_ids)
+
+    flash('Artist ' + artist_name + ' was successfully deleted!')
+  except:
+    db.session.rollback()
+    flash('Error! Artist could not be deleted')
+    print(sys.exc_info())
+    return jsonify({ 'success': False }), 500
+  finally:
+    db.session.close()
+  return jsonify({ 'success': True, 'deleted': deleted })
+
 #  Create Artist
 #  ----------------------------------------------------------------
 
@@ -522,6 +1382,8 @@ def create_artist_submission():
     
     db.session.add(new_artist)
     db.session.commit()
+    index_name(Artist, new_artist.id, new_artist.name)
+    pages_changed('artists')
 
     # on successful db insert, flash success
     flash('Artist ' + request.form['name'] + ' was successfully listed!')
@@ -546,7 +1408,7 @@ def edit_artist(artist_id):
   artist={
     "id": artist.id,
     "name": artist.name,
-    "genres": artist.genres,
+    "genres": list(artist.genres),
     "city": artist.city,
     "state": artist.state,
     "phone": artist.phone,
@@ -582,8 +1444,11 @@ def edit_artist_submission(artist_id):
 
     artist.seeking_description = form.seeking_description.data
     artist.image_link = form.image_link.data
+    artist.updated_at = datetime.utcnow()
 
     db.session.commit()
+    index_name(Artist, artist_id, artist.name)
+    invalidate_artist_pages(artist_id)
 
     # on successful db insert, flash success
     flash('Artist ' + request.form['name'] + ' was successfully listed!')
@@ -602,25 +1467,30 @@ def edit_artist_submission(artist_id):
 #  ----------------------------------------------------------------
 
 @app.route('/shows')
+@response_cache.cached('shows', validator=shows_validators)
 def shows():
-  # displays list of shows at /shows
-  # replace with real venues data.
-  #       num_shows should be aggregated based on number of upcoming shows per venue.
-  
-  data = []
-  all_shows = Show.query.all()
-
-  for show in all_shows:
-    data.append({
-      "venue_id": show.venue_id,
-      "venue_name": Venue.query.filter_by(id=show.venue_id).first().name,
-      "artist_id": show.artist_id,
-      "artist_name": Artist.query.filter_by(id=show.artist_id).first().name,
-      "artist_image_link": Artist.query.filter_by(id=show.artist_id).first().image_link,
-      "start_time": format_datetime(str(show.start_time))
-    })
+  # displays list of shows at /shows, one page at a time, optionally
+  # restricted to the days between ?from= and ?to= (YYYY-MM-DD, inclusive)
+  after = request.args.get('after', type=parse_cursor)
+  start = request.args.get('from', type=parse_date)
+  end = request.args.get('to', type=parse_date)
+  limit = request.args.get('limit', type=int)
+  if limit is not None and limit < 1:
+    limit = None
+
+  data, next_cursor = shows_page(after=after,
+                                 start=start,
+                                 end=end + timedelta(days=1) if end else None,
+                                 limit=limit)
+
+  filters = {
+    "from": request.args.get('from') if start else None,
+    "to": request.args.get('to') if end else None,
+    "limit": limit
+  }
 
-  return render_template('pages/shows.html', shows=data)
+  return render_template('pages/shows.html', shows=data, next_cursor=next_cursor,
+                         paginated=after is not None, filters=filters)
 
 @app.route('/shows/create')
 def create_shows():
@@ -638,13 +1508,32 @@ def create_show_submission():
     new_artist_id = form.artist_id.data
     new_venue_id = form.venue_id.data
     new_start_time = form.start_time.data
+    new_duration = form.duration.data or DEFAULT_SHOW_DURATION
+    if not form.duration.validate(form):
+      flash('Error! ' + ' '.join(form.duration.errors))
+      return render_template('forms/new_show.html', form=form)
+
+    # Locking the venue and artist rows makes concurrent bookings of either wait
+    # for this one, so they see its show when they look for conflicts.
+    db.session.execute(select(Venue.id).where(Venue.id == new_venue_id).with_for_update())
+    db.session.execute(select(Artist.id).where(Artist.id == new_artist_id).with_for_update())
+    conflicts = show_conflicts(new_venue_id, new_artist_id, new_start_time, new_duration)
+    if conflicts:
+      db.session.rollback()
+      start, end, _, venue_id, _ = conflicts[0]
+      booked = 'Venue' if str(venue_id) == str(new_venue_id) else 'Artist'
+      flash(f'Error! {booked} is already booked from {format_datetime(start)} to {format_datetime(end)}')
+      return render_template('forms/new_show.html', form=form)
 
     new_show = Show(artist_id=new_artist_id, 
                     venue_id=new_venue_id, 
-                    start_time=new_start_time)
+                    start_time=new_start_time,
+                    duration=new_duration)
     
     db.session.add(new_show)
+    add_show_count(new_show, datetime.now())
     db.session.commit()
+    pages_changed('venues', 'shows', f'venue:{new_venue_id}', f'artist:{new_artist_id}')
 
     # on successful db insert, flash success
     flash('Show was successfully listed!')
@@ -658,6 +1547,249 @@ def create_show_submission():
 
   return render_template('pages/home.html')
 
+@app.route('/shows/<int:show_id>', methods=['DELETE'])
+def delete_show(show_id):
+  try:
+    shows = delete_returning(delete(Show).where(Show.id == show_id), Show.venue_id, Show.artist_id)
+    if not shows:
+      db.session.rollback()
+      return jsonify({ 'success': False }), 404
+
+    venue_id, artist_id = shows[0]
+    refresh_show_counts(Venue, [venue_id])
+    refresh_show_counts(Artist, [artist_id])
+    db.session.commit()
+    pages_changed('venues', 'shows', f'venue:{venue_id}', f'artist:{artist_id}')
+
+    flash('Show was successfully deleted!')
+  except:
+    db.session.rollback()
+    flash('Error! Show could not be deleted')
+    print(sys.exc_info())
+    return jsonify({ 'success': False }), 500
+  finally:
+    db.session.close()
+  return jsonify({ 'success': True, 'deleted': { 'Show': len(shows) } })
+
+#  Export
+#  ----------------------------------------------------------------
+
+@app.route('/export/<any(venues, artists, shows):kind>.<any(csv, jsonl):format>')
+def export(kind, format):
+  # streams every venue, artist or show, or with ?since= (ISO date or date and
+  # time) only those created or changed since then
+  since = None
+  if request.args.get('since'):
+    try:
+      since = parse_since(request.args['since'])
+    except ValueError:
+      abort(400)
+
+  _, mimetype = EXPORT_FORMATS[format]
+  response = Response(export_chunks(kind, format, since), mimetype=mimetype)
+  response.headers['Content-Disposition'] = f'attachment; filename={kind}.{format}'
+  return response
+
+#  API
+#  ----------------------------------------------------------------
+# JSON for clients that do not need the pages. List endpoints take ?fields=
+# (comma separated), ?limit= and ?after= (the "next" value of the page before).
+
+API_LIST_FIELDS = ('id', 'name', 'city', 'state', 'num_upcoming_shows')
+API_SHOW_FIELDS = ('id', 'start_time', 'venue_id', 'venue_name', 'artist_id', 'artist_name', 'artist_image_link')
+
+def api_owner_list(model):
+  available = list(API_COLUMNS[model]) + ['genres', 'num_upcoming_shows']
+  try:
+    fields = parse_fields(request.args.get('fields'), available, API_LIST_FIELDS)
+  except ValueError as error:
+    return error_response(400, str(error))
+
+  data, next_cursor = api_owners(model, fields,
+                                 after=request.args.get('after', type=int),
+                                 limit=request.args.get('limit', type=int),
+                                 genre=request.args.get('genre'))
+  return json_response({"data": data, "next": next_cursor})
+
+def api_owner_detail(model, owner_id):
+  counts = ['upcoming_shows_count', 'past_shows_count']
+  available = list(API_COLUMNS[model]) + ['genres'] + counts
+  try:
+    fields = parse_fields(request.args.get('fields'), available, available)
+  except ValueError as error:
+    return error_response(400, str(error))
+
+  records, _ = api_owners(model, [field for field in fields if field not in counts], owner_id=owner_id, limit=1)
+  if not records:
+    return error_response(404, 'Not found')
+
+  record = records[0]
+  if any(field in counts for field in fields):
+    upcoming, past = show_counts(model, owner_id, datetime.now())
+    for field, count in zip(counts, (upcoming, past)):
+      if field in fields:
+        record[field] = count
+  return json_response(record)
+
+def api_search(model):
+  return json_response(search_results(model, request.args.get('q', ''), request.args.get('genre')))
+
+def api_suggest(model):
+  # As-you-type suggestions for the search boxes, answered from the in-process
+  # name index without a database query once the index is built. Not cached:
+  # every keystroke is a new URL and the index lookup is cheaper than the cache.
+  limit = min(request.args.get('limit', app.config['SUGGESTIONS_LIMIT'], type=int), app.config['SEARCH_RESULTS_LIMIT'])
+  suggestions = name_index(model).suggest(request.args.get('q', ''), limit)
+  return json_response({'data': [{'id': id, 'name': name} for id, name in suggestions]})
+
+def availability_window():
+  # ?from= and ?to= of the availability endpoints, ISO dates or dates and times
+  start = request.args.get('from', type=parse_since)
+  end = request.args.get('to', type=parse_since)
+  if start is None or end is None:
+    raise ValueError('from and to are required, as ISO dates or dates and times')
+  if end <= start:
+    raise ValueError('to must be after from')
+  if end - start > timedelta(days=app.config['AVAILABILITY_MAX_DAYS']):
+    raise ValueError(f'from and to must be at most {app.config["AVAILABILITY_MAX_DAYS"]} days apart')
+  return start, end
+
+def api_available(model):
+  # also ?city=, ?state=, ?genre= and ?limit=
+  try:
+    start, end = availability_window()
+  except ValueError as error:
+    return error_response(400, str(error))
+
+  owners = available_owners(model, start, end,
+                            city=request.args.get('city'),
+                            state=request.args.get('state'),
+                            genre=request.args.get('genre'),
+                            limit=api_limit(request.args.get('limit', type=int)))
+  return json_response({"data": owners})
+
+def api_free_slots(model, owner_id):
+  # free time of one venue (or artist) between ?from= and ?to=, in gaps of at least ?length= minutes
+  try:
+    start, end = availability_window()
+  except ValueError as error:
+    return error_response(400, str(error))
+  if db.session.query(model.id).filter(model.id == owner_id).first() is None:
+    return error_response(404, 'Not found')
+
+  length = timedelta(minutes=max(request.args.get('length', 0, type=int), 0))
+  slots = owner_free_slots(model, owner_id, start, end, length)
+  return json_response({"data": [{"start": slot_start, "end": slot_end} for slot_start, slot_end in slots]})
+
+def nearby_origin():
+  # ?lat= and ?lon= of the nearby search, or the centre of ?city= and ?state=
+  latitude = request.args.get('lat', type=float)
+  longitude = request.args.get('lon', type=float)
+  if latitude is None or longitude is None:
+    if not request.args.get('city'):
+      raise ValueError('lat and lon, or city and state, are required')
+    centroid = city_centroids.get(request.args.get('city'), request.args.get('state'))
+    if centroid is None:
+      raise ValueError('unknown city, give lat and lon instead')
+    return centroid
+  if not -90 <= latitude <= 90 or not -180 <= longitude <= 180:
+    raise ValueError('lat must be within -90 and 90, lon within -180 and 180')
+  return latitude, longitude
+
+@app.route('/api/venues')
+@response_cache.cached('venues')
+def api_venues():
+  return api_owner_list(Venue)
+
+@app.route('/api/venues/search')
+@response_cache.cached('venues')
+def api_search_venues():
+  return api_search(Venue)
+
+@app.route('/api/venues/suggest')
+def api_suggest_venues():
+  return api_suggest(Venue)
+
+@app.route('/api/venues/<int:venue_id>')
+@response_cache.cached('venue:{venue_id}')
+def api_venue(venue_id):
+  return api_owner_detail(Venue, venue_id)
+
+@app.route('/api/venues/available')
+@response_cache.cached('venues', 'shows')
+def api_available_venues():
+  return api_available(Venue)
+
+@app.route('/api/venues/<int:venue_id>/free_slots')
+@response_cache.cached('venue:{venue_id}')
+def api_venue_free_slots(venue_id):
+  return api_free_slots(Venue, venue_id)
+
+@app.route('/api/venues/near')
+@response_cache.cached('venues')
+def api_venues_near():
+  # venues nearest first, within ?radius= km if given, up to ?limit=
+  max_radius_km = app.config['NEARBY_MAX_RADIUS_KM']
+  radius_km = request.args.get('radius', type=float)
+  try:
+    latitude, longitude = nearby_origin()
+    if radius_km is not None and not 0 < radius_km <= max_radius_km:
+      raise ValueError(f'radius must be more than 0 and at most {max_radius_km:g} km')
+  except ValueError as error:
+    return error_response(400, str(error))
+
+  venues = venues_near(latitude, longitude, radius_km, request.args.get('limit', type=int))
+  return json_response({"origin": {"latitude": latitude, "longitude": longitude}, "data": venues})
+
+@app.route('/api/artists')
+# listed with their upcoming show counts, so show changes clear them too
+@response_cache.cached('artists', 'shows')
+def api_artists():
+  return api_owner_list(Artist)
+
+@app.route('/api/artists/search')
+@response_cache.cached('artists', 'shows')
+def api_search_artists():
+  return api_search(Artist)
+
+@app.route('/api/artists/suggest')
+def api_suggest_artists():
+  return api_suggest(Artist)
+
+@app.route('/api/artists/<int:artist_id>')
+@response_cache.cached('artist:{artist_id}')
+def api_artist(artist_id):
+  return api_owner_detail(Artist, artist_id)
+
+@app.route('/api/artists/available')
+@response_cache.cached('artists', 'shows')
+def api_available_artists():
+  return api_available(Artist)
+
+@app.route('/api/artists/<int:artist_id>/free_slots')
+@response_cache.cached('artist:{artist_id}')
+def api_artist_free_slots(artist_id):
+  return api_free_slots(Artist, artist_id)
+
+@app.route('/api/shows')
+@response_cache.cached('shows')
+def api_shows_list():
+  # also ?from= and ?to= (YYYY-MM-DD, inclusive) as on /shows, and ?venue_id= or ?artist_id=
+  try:
+    fields = parse_fields(request.args.get('fields'), API_SHOW_COLUMNS, API_SHOW_FIELDS)
+  except ValueError as error:
+    return error_response(400, str(error))
+
+  end = request.args.get('to', type=parse_date)
+  data, next_cursor = api_shows(fields,
+                                after=request.args.get('after', type=parse_cursor),
+                                start=request.args.get('from', type=parse_date),
+                                end=end + timedelta(days=1) if end else None,
+                                limit=request.args.get('limit', type=int),
+                                venue_id=request.args.get('venue_id', type=int),
+                                artist_id=request.args.get('artist_id', type=int))
+  return json_response({"data": data, "next": next_cursor})
+
 @app.errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
@@ -677,6 +1809,326 @@ if not app.debug:
     app.logger.addHandler(file_handler)
     app.logger.info('errors')
 
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+FULL_SHOW_SCAN = re.compile(r'^(SCAN (TABLE )?"?Show\b"?(?!.* USING )|.*Seq Scan on "Show")')
+
+@app.cli.command('check-indexes')
+def check_indexes():
+  """Explain every query the read routes run and fail on full scans of Show,
+  or when a route's plans do not use the indexes it is meant to use."""
+  venue_id = db.session.query(func.min(Venue.id)).scalar()
+  artist_id = db.session.query(func.min(Artist.id)).scalar()
+  if venue_id is None or artist_id is None:
+    raise click.ClickException('The database needs at least one venue and one artist.')
+
+  postgres = db.engine.dialect.name == 'postgresql'
+  # Postgres searches names through the trigram indexes; other databases through
+  # the in-process name index, which checks updated_at before every search
+  if postgres:
+    venue_search, artist_search = 'ix_Venue_name_trgm', 'ix_Artist_name_trgm'
+  else:
+    venue_search, artist_search = 'ix_Venue_updated_at', 'ix_Artist_updated_at'
+  nearby = 'ix_Venue_geography' if has_postgis() else 'ix_Venue_geohash'
+
+  # method, path, form data and the indexes the route's plans must use
+  routes = [
+    ('GET', '/venues', None, ['ix_Show_venue_id_start_time']),
+    ('GET', '/venues?genre=Jazz', None, ['ix_VenueGenre_genre']),
+    ('GET', f'/venues/{venue_id}', None, ['ix_Show_venue_id_start_time']),
+    ('GET', f'/venues/{venue_id}/past_shows?page=2', None, ['ix_Show_venue_id_start_time']),
+    ('GET', '/artists?genre=Jazz', None, ['ix_ArtistGenre_genre']),
+    ('GET', f'/artists/{artist_id}', None, ['ix_Show_artist_id_start_time']),
+    ('GET', f'/artists/{artist_id}/past_shows?page=2', None, ['ix_Show_artist_id_start_time']),
+    ('GET', '/shows', None, ['ix_Show_start_time_id']),
+    ('GET', '/shows?from=2020-01-01&to=2020-12-31', None, ['ix_Show_start_time_id']),
+    ('GET', '/api/venues/available?from=2020-01-03T19:00&to=2020-01-04&city=San Francisco&state=CA', None,
+     ['ix_Venue_city_state', 'ix_Show_venue_id_start_time']),
+    ('GET', '/api/artists/available?from=2020-01-03T19:00&to=2020-01-04&genre=Jazz', None,
+     ['ix_ArtistGenre_genre', 'ix_Show_start_time_id']),
+    ('GET', f'/api/venues/{venue_id}/free_slots?from=2020-01-01&to=2020-01-31', None, ['ix_Show_venue_id_start_time']),
+    ('GET', '/api/venues/near?lat=37.7793&lon=-122.4193&radius=10', None, [nearby]),
+    ('POST', '/venues/search', {'search_term': 'music'}, [venue_search]),
+    ('POST', '/artists/search', {'search_term': 'band'}, [artist_search]),
+  ]
+
+  statements = []
+  def record(conn, cursor, statement, parameters, context, executemany):
+    statements.append((statement, parameters))
+
+  explain = 'EXPLAIN ' if postgres else 'EXPLAIN QUERY PLAN '
+  client = app.test_client()
+  full_scans = 0
+  unused = 0
+
+  for method, path, data, indexes in routes:
+    del statements[:]
+    # GET routes may read from the replica; its plans are explained on the primary
+    for engine in db.engines.values():
+      event.listen(engine, 'before_cursor_execute', record)
+    try:
+      client.open(path, method=method, data=data)
+    finally:
+      for engine in db.engines.values():
+        event.remove(engine, 'before_cursor_execute', record)
+
+    click.echo(f'{method} {path}')
+    connection = db.engine.raw_connection()
+    plans = []
+    try:
+      cursor = connection.cursor()
+      if postgres:
+        # tiny tables are always cheaper to scan; ask whether an index *can* be used
+        cursor.execute('SET enable_seqscan = off')
+      for statement, parameters in statements:
+        cursor.execute(explain + statement, parameters)
+        plan = [row[-1] for row in cursor.fetchall()]
+        plans.extend(plan)
+        click.echo('  ' + ' '.join(statement.split())[:100])
+        for line in plan:
+          full_scan = FULL_SHOW_SCAN.match(line.strip())
+          full_scans += bool(full_scan)
+          click.echo(f'    {"FULL SCAN " if full_scan else ""}{line.strip()}')
+    finally:
+      connection.close()
+
+    for index in indexes:
+      if not any(index in line for line in plans):
+        unused += 1
+        click.echo(f'  UNUSED INDEX {index}')
+
+  if full_scans or unused:
+    raise click.ClickException(f'{full_scans} full scan(s) of Show found, {unused} index(es) not used.')
+  click.echo('All Show lookups use an index, and every route uses the indexes meant for it.')
+
+def validate_record(form, record):
+  # Runs an imported record through the same form (and so the same rules) as the
+  # web pages. One form is reused for every record; binding its fields costs as
+  # much as validating them.
+  formdata = MultiDict()
+  for key, value in record.items():
+    if key == 'genres':
+      if isinstance(value, str):
+        value = [genre.strip() for genre in value.split(',') if genre.strip()]
+      formdata.setlist('genres', value or [])
+    elif value is not None:
+      formdata[key] = str(value)
+  form.process(formdata)
+  return dict(form.errors) if not form.validate() else None
+
+def venue_import_row(form):
+  return ({
+    "name": form.name.data,
+    "address": form.address.data,
+    "city": form.city.data,
+    "state": form.state.data,
+    "phone": form.phone.data,
+    "website": form.website.data,
+    "facebook_link": form.facebook_link.data,
+    "seeking_talent": form.seeking_talent.data == 'Yes',
+    "seeking_description": form.seeking_description.data,
+    "image_link": form.image_link.data,
+    **venue_location(form.latitude.data, form.longitude.data, form.city.data, form.state.data)
+  }, None)
+
+def artist_import_row(form):
+  return ({
+    "name": form.name.data,
+    "city": form.city.data,
+    "state": form.state.data,
+    "phone": form.phone.data,
+    "website": form.website.data,
+    "facebook_link": form.facebook_link.data,
+    "seeking_venue": form.seeking_venue.data == 'Yes',
+    "seeking_description": form.seeking_description.data,
+    "image_link": form.image_link.data
+  }, None)
+
+def show_import_row(form):
+  # ShowForm leaves the ids unchecked; the database would reject the whole batch
+  row = {"start_time": form.start_time.data, "duration": form.duration.data or DEFAULT_SHOW_DURATION}
+  for field, model in (('venue_id', Venue), ('artist_id', Artist)):
+    value = getattr(form, field).data
+    if not str(value).isdigit():
+      return None, {field: ["Not a number."]}
+    row[field] = int(value)
+    if row[field] not in known_ids(model):
+      return None, {field: ["No such " + model.__tablename__.lower() + "."]}
+  return row, None
+
+def known_ids(model):
+  # ids of every venue (or artist), loaded once per import run
+  ids = g.setdefault('known_ids', {})
+  if model not in ids:
+    ids[model] = {id for id, in db.session.query(model.id)}
+  return ids[model]
+
+IMPORTS = {
+  'venues': (VenueForm, Venue, VenueGenre, 'venue_id', venue_import_row),
+  'artists': (ArtistForm, Artist, ArtistGenre, 'artist_id', artist_import_row),
+  'shows': (ShowForm, Show, None, None, show_import_row),
+}
+
+@app.cli.command('import')
+@click.argument('kind', type=click.Choice(sorted(IMPORTS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'format', type=click.Choice(['csv', 'jsonl']), help='Defaults to the file extension.')
+@click.option('--batch-size', default=5000, show_default=True)
+@click.option('--resume', is_flag=True, help='Continue an interrupted import of the same file.')
+@click.option('--restart', is_flag=True, help='Ignore an interrupted import and load the whole file.')
+def import_data(kind, path, format, batch_size, resume, restart):
+  """Stream venues, artists or shows from a CSV or JSONL file into the database.
+
+  Records are checked with the same form as the create pages, and shows for
+  bookings that overlap as well, including the earlier shows of the file;
+  rejected records are listed in PATH.rejected. Rows are inserted a batch at a time (COPY on Postgres)
+  and each batch is committed, so an interrupted import can be --resume'd.
+  """
+  form_class, model, genre_model, owner_column, import_row = IMPORTS[kind]
+  checkpoint = Checkpoint(path)
+  done = 0
+  if checkpoint.exists():
+    if resume:
+      done = checkpoint.load()
+      click.echo(f'Resuming after record {done}.')
+    elif not restart:
+      raise click.ClickException(f'{path} was partly imported before; use --resume or --restart.')
+
+  throughput = Throughput()
+  affected = set()
+  records = ((number, record) for number, record in read_records(path, format) if number > done)
+
+  with open(path + '.rejected', 'a' if done else 'w') as rejects, app.test_request_context():
+    form = form_class(meta={'csrf': False})
+    for batch in batches(records, batch_size):
+      now = datetime.utcnow()
+      rows = []
+      numbers = []
+      genres = []
+      rejected = []
+      for number, record in batch:
+        errors = validate_record(form, record)
+        if not errors:
+          row, errors = import_row(form)
+        if errors:
+          rejected.append((number, errors))
+          continue
+        if genre_model is not None:
+          genres.append(form.genres.data)
+        row['version'] = 1
+        row['updated_at'] = now
+        rows.append(row)
+        numbers.append(number)
+
+      if model is Show and rows:
+        # overlapping bookings are rejected as on the create page, within the file too
+        conflicts = batch_show_conflicts(rows)
+        rejected.extend((number, errors) for number, errors in zip(numbers, conflicts) if errors)
+        rows = [row for row, errors in zip(rows, conflicts) if not errors]
+      for number, errors in sorted(rejected, key=lambda rejection: rejection[0]):
+        rejects.write(json.dumps({"record": number, "errors": errors}) + '\n')
+
+      # always the primary, whatever the request context the form needs says
+      connection = db.session.connection(bind_arguments={'bind': db.engine})
+      if genre_model is not None and rows:
+        for row, id in zip(rows, reserve_ids(connection, model.__table__, len(rows))):
+          row['id'] = id
+      insert_rows(connection, model.__table__, rows)
+      if genre_model is not None:
+        insert_rows(connection, genre_model.__table__,
+                    [{owner_column: row['id'], "genre": genre}
+                     for row, row_genres in zip(rows, genres) for genre in dict.fromkeys(row_genres)])
+      else:
+        affected.update((row['venue_id'], row['artist_id']) for row in rows)
+        refresh_show_counts(Venue, {row['venue_id'] for row in rows})
+        refresh_show_counts(Artist, {row['artist_id'] for row in rows})
+      db.session.commit()
+
+      checkpoint.save(batch[-1][0])
+      throughput.add(len(rows), len(batch) - len(rows))
+      click.echo(f'{batch[-1][0]} records read: {throughput}')
+
+  checkpoint.clear()
+  if kind == 'shows':
+    pages_changed('venues', 'shows',
+                  *{f'venue:{venue_id}' for venue_id, _ in affected},
+                  *{f'artist:{artist_id}' for _, artist_id in affected})
+  else:
+    pages_changed(kind)
+  click.echo(f'Done: {throughput}')
+
+@app.cli.command('export')
+@click.argument('kind', type=click.Choice(['artists', 'shows', 'venues']))
+@click.option('--format', 'format', type=click.Choice(sorted(EXPORT_FORMATS)), default='jsonl', show_default=True)
+@click.option('--since', type=parse_since, help='Only rows created or changed since this ISO date or date and time.')
+@click.option('--output', '-o', default='-', help='File to write to, standard output by default.')
+def export_data(kind, format, since, output):
+  """Stream every venue, artist or show to a CSV or JSONL file."""
+  with click.open_file(output, 'w', encoding='utf-8') as target:
+    for chunk in export_chunks(kind, format, since):
+      target.write(chunk)
+
+@app.cli.command('refresh-show-counts')
+@click.option('--all', 'everything', is_flag=True, help='Recount every venue and artist, not only the stale counters.')
+@click.option('--every', type=float, help='Keep running, refreshing every this many seconds.')
+def refresh_show_counts_command(everything, every):
+  """Move shows that have started from the upcoming to the past show counts."""
+  while True:
+    if everything:
+      refresh_show_counts(Venue)
+      refresh_show_counts(Artist)
+      db.session.commit()
+      pages_changed('venues', 'artists', 'shows')
+      click.echo('Recounted the shows of every venue and artist.')
+    else:
+      refreshed = refresh_stale_show_counts()
+      db.session.commit()
+      if refreshed:
+        # pages cached before those shows started still list them as upcoming
+        pages_changed('venues', 'shows', *refreshed)
+        click.echo(f'Refreshed {len(refreshed)} show counter(s).')
+    if not every:
+      break
+    time.sleep(every)
+
+@app.cli.command('build-assets')
+def build_assets_command():
+  """Copy static files under content-hashed names, with gzip and brotli variants."""
+  manifest = build_assets(app.static_folder, os.path.dirname(app.config['STATIC_MANIFEST']))
+  click.echo(f'Built {len(manifest)} assets; restart the app to serve them.')
+
+class MigrateCommands(click.Group):
+    """`flask db`, from Flask-Migrate.
+
+    Flask-Migrate imports alembic, which costs more to import than the rest
+    of the app besides Flask and SQLAlchemy, so it is set up only when a
+    `flask db` command runs rather than in every worker and CLI invocation.
+    """
+
+    def migrate_commands(self):
+      if 'migrate' not in app.extensions:
+        from flask_migrate import Migrate
+        Migrate(app, db)
+      from flask_migrate.cli import db as db_commands
+      return db_commands
+
+    # options, callback and subcommands are all Flask-Migrate's
+    def get_params(self, ctx):
+      return self.migrate_commands().get_params(ctx)
+
+    def invoke(self, ctx):
+      return self.migrate_commands().invoke(ctx)
+
+    def list_commands(self, ctx):
+      return self.migrate_commands().list_commands(ctx)
+
+    def get_command(self, ctx, name):
+      return self.migrate_commands().get_command(ctx, name)
+
+app.cli.add_command(MigrateCommands('db', help='Perform database migrations.'))
+
 #----------------------------------------------------------------------------#
 # Launch.
 #----------------------------------------------------------------------------#
@@ -0,0 +1,15 @@
+"""ASGI entry point: the Flask app under an ASGI server.
+
+  $ pip install uvicorn asgiref
+  $ uvicorn asgi:application --workers 4
+
+Every request, the searches included, runs synchronously in the Flask app,
+which asgiref runs in a thread, exactly as under `flask run` or a WSGI
+server. Searching on an async engine was slower than this on SQLite and
+has no measured gain on Postgres, so there is no async path.
+"""
+from asgiref.wsgi import WsgiToAsgi
+
+from app import app
+
+application = WsgiToAsgi(app)
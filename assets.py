@@ -0,0 +1,130 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+
+from flask import abort, current_app, request, send_from_directory
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Characters of the content hash put in each built file name
+HASH_LENGTH = 12
+
+# Extensions worth precompressing; images and woff fonts are compressed already
+COMPRESSIBLE = {'.css', '.js', '.map', '.svg', '.json', '.txt', '.html', '.ttf', '.otf', '.eot'}
+
+# Content-Encoding and file suffix of the precompressed variants, best first
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+
+def compressed_variants(data):
+    # {suffix: bytes} of the variants that come out smaller than the file itself
+    variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(data, quality=11)
+    return {suffix: body for suffix, body in variants.items() if len(body) < len(data)}
+
+
+def build_assets(static_folder, output='dist'):
+    """Copy every static file into static_folder/output under a content-hashed name.
+
+    css/main.css becomes dist/css/main.<hash>.css, next to a copy under its
+    own name so that relative URLs inside the assets still resolve. Text
+    assets get .gz (and, with the brotli package, .br) variants. Files of
+    earlier builds are left in place, for pages still referencing them.
+    Writes and returns the manifest, {source path: built path}, both
+    relative to static_folder.
+    """
+    output_folder = os.path.join(static_folder, output)
+    manifest = {}
+    for directory, subdirectories, filenames in os.walk(static_folder):
+        if directory == static_folder and output in subdirectories:
+            subdirectories.remove(output)
+        for filename in filenames:
+            source = os.path.join(directory, filename)
+            path = os.path.relpath(source, static_folder).replace(os.sep, '/')
+            with open(source, 'rb') as source_file:
+                data = source_file.read()
+
+            stem, extension = os.path.splitext(path)
+            hashed = f'{stem}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{extension}'
+            variants = compressed_variants(data) if extension.lower() in COMPRESSIBLE else {}
+            for built in (path, hashed):
+                target = os.path.join(output_folder, built)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.copyfile(source, target)
+                for suffix, body in variants.items():
+                    with open(target + suffix, 'wb') as variant_file:
+                        variant_file.write(body)
+            manifest[path] = f'{output}/{hashed}'
+
+    with open(os.path.join(output_folder, 'manifest.json'), 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+    return manifest
+
+
+class StaticAssets(object):
+    """Serves the fingerprinted assets written by build_assets().
+
+    Once static/dist/manifest.json exists, url_for('static', filename=...)
+    gives the hashed name of any file listed in it. Hashed files are sent
+    with a far-future, immutable Cache-Control (STATIC_MAX_AGE seconds),
+    since a changed file gets a new name. Their precompressed variant is
+    sent when the client accepts it. Without a manifest, static files are
+    served as usual.
+    """
+
+    def __init__(self, app=None):
+        self.manifest = {}
+        self.hashed = set()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('STATIC_MANIFEST', 'dist/manifest.json')
+        app.config.setdefault('STATIC_MAX_AGE', 365 * 24 * 3600)
+
+        manifest_path = os.path.join(app.static_folder, app.config['STATIC_MANIFEST'])
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as manifest_file:
+                self.manifest = json.load(manifest_file)
+        self.hashed = set(self.manifest.values())
+        self.output = os.path.dirname(app.config['STATIC_MANIFEST']) + '/'
+
+        app.url_defaults(self.hashed_url)
+        app.view_functions['static'] = self.send_static
+        app.extensions['static_assets'] = self
+
+    def hashed_url(self, endpoint, values):
+        if endpoint == 'static' and values.get('filename') in self.manifest:
+            values['filename'] = self.manifest[values['filename']]
+
+    def send_static(self, filename):
+        if not filename.startswith(self.output):
+            return current_app.send_static_file(filename)
+
+        static_folder = current_app.static_folder
+        path = safe_join(static_folder, filename)
+        if path is None:
+            abort(404)
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        available = [(encoding, suffix) for encoding, suffix in ENCODINGS if os.path.isfile(path + suffix)]
+        encoding = request.accept_encodings.best_match([encoding for encoding, _ in available])
+
+        hashed = filename in self.hashed
+        max_age = current_app.config['STATIC_MAX_AGE'] if hashed else None
+        suffix = dict(available)[encoding] if encoding else ''
+        response = send_from_directory(static_folder, filename + suffix, mimetype=mimetype, max_age=max_age)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if available:
+            response.vary.add('Accept-Encoding')
+        if hashed:
+            response.cache_control.immutable = True
+        return response
@@ -0,0 +1,51 @@
+from bisect import bisect_left
+from datetime import timedelta
+
+
+def merged(intervals):
+    # (start, end) pairs sorted and with overlapping or touching ones joined
+    merged_intervals = []
+    for start, end in sorted(intervals):
+        if merged_intervals and start <= merged_intervals[-1][1]:
+            if end > merged_intervals[-1][1]:
+                merged_intervals[-1] = (merged_intervals[-1][0], end)
+        else:
+            merged_intervals.append((start, end))
+    return merged_intervals
+
+
+def overlapping(intervals, start, end):
+    # the (start, end, ...) tuples sharing some time with [start, end)
+    return [interval for interval in intervals if interval[0] < end and interval[1] > start]
+
+
+def first_overlap(intervals, start, end, longest):
+    # the first of the sorted (start, end) intervals, none longer than longest,
+    # that shares some time with [start, end), or None
+    for index in range(bisect_left(intervals, (start - longest,)), len(intervals)):
+        if intervals[index][0] >= end:
+            break
+        if intervals[index][1] > start:
+            return intervals[index]
+    return None
+
+
+def free_slots(busy, start, end, length=timedelta(0)):
+    """Gaps of at least `length` between the busy (start, end) intervals within [start, end).
+
+    Busy intervals may be unsorted, overlap each other or extend past the
+    window; the gaps are returned in order as (start, end) pairs.
+    """
+    slots = []
+    free_from = start
+    for busy_start, busy_end in merged(busy):
+        if busy_end <= free_from:
+            continue
+        if busy_start >= end:
+            break
+        if busy_start - free_from >= length and busy_start > free_from:
+            slots.append((free_from, busy_start))
+        free_from = max(free_from, busy_end)
+    if end - free_from >= length and end > free_from:
+        slots.append((free_from, end))
+    return slots
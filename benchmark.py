@@ -0,0 +1,258 @@
+"""Benchmark every route through the Flask test client.
+
+  $ DATABASE_URL=sqlite:///bench.db python seed.py --scale 100k --create-tables
+  $ DATABASE_URL=sqlite:///bench.db python benchmark.py
+  $ DATABASE_URL=sqlite:///bench.db python benchmark.py --compare benchmarks/<earlier run>.json
+
+For each route it reports latency percentiles, statements per request and
+the peak memory allocated while serving one request. Results are written to
+benchmarks/<timestamp>-<commit>.json; --compare prints the change against an
+earlier run. The response cache is bypassed unless --cache is given, so the
+numbers measure the routes themselves. Write routes run last and remove what
+they create, and each is checked in the database to have done what it should
+(a create adds its row, a conflicting booking adds none); the run stops with
+an error on the first that did not.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, func
+
+from app import app, db, response_cache, Venue, Artist, Show
+from cache import NullCache
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks')
+
+
+def busiest(model, owner_column):
+    # the venue (or artist) with the most shows, the slowest detail page
+    row = db.session.query(owner_column, func.count(Show.id)) \
+        .group_by(owner_column).order_by(func.count(Show.id).desc()).first()
+    return row[0] if row else db.session.query(func.min(model.id)).scalar()
+
+
+def read_routes():
+    venue_id = busiest(Venue, Show.venue_id)
+    artist_id = busiest(Artist, Show.artist_id)
+    year = datetime.now().year
+    venue = db.session.get(Venue, venue_id)
+    # Friday night of next week, and the month after today
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    friday = today + timedelta(days=7 + (4 - today.weekday()) % 7, hours=19)
+    night = f'from={friday:%Y-%m-%dT%H:%M}&to={friday + timedelta(hours=5):%Y-%m-%dT%H:%M}'
+    month = f'from={today:%Y-%m-%d}&to={today + timedelta(days=30):%Y-%m-%d}'
+    return [
+        ('index', 'GET', '/', None),
+        ('venues', 'GET', '/venues', None),
+        ('venues_by_genre', 'GET', '/venues?genre=Jazz', None),
+        ('search_venues', 'POST', '/venues/search', {'search_term': 'the'}),
+        ('show_venue', 'GET', f'/venues/{venue_id}', None),
+        ('show_venue_past_shows', 'GET', f'/venues/{venue_id}/past_shows?page=3', None),
+        ('create_venue_form', 'GET', '/venues/create', None),
+        ('edit_venue', 'GET', f'/venues/{venue_id}/edit', None),
+        ('artists', 'GET', '/artists', None),
+        ('artists_by_genre', 'GET', '/artists?genre=Jazz', None),
+        ('search_artists', 'POST', '/artists/search', {'search_term': 'wolves'}),
+        ('show_artist', 'GET', f'/artists/{artist_id}', None),
+        ('show_artist_past_shows', 'GET', f'/artists/{artist_id}/past_shows?page=3', None),
+        ('create_artist_form', 'GET', '/artists/create', None),
+        ('edit_artist', 'GET', f'/artists/{artist_id}/edit', None),
+        ('shows', 'GET', '/shows', None),
+        ('shows_window', 'GET', f'/shows?from={year}-01-01&to={year}-01-31', None),
+        ('create_show_form', 'GET', '/shows/create', None),
+        ('api_venues', 'GET', '/api/venues', None),
+        ('api_search_venues', 'GET', '/api/venues/search?q=the', None),
+        ('api_venue', 'GET', f'/api/venues/{venue_id}', None),
+        ('api_available_venues', 'GET', f'/api/venues/available?{night}&city={venue.city}&state={venue.state}', None),
+        ('api_available_venues_all', 'GET', f'/api/venues/available?{night}&limit=100', None),
+        ('api_venue_free_slots', 'GET', f'/api/venues/{venue_id}/free_slots?{month}&length=180', None),
+        ('api_venues_near', 'GET', '/api/venues/near?lat=37.7793&lon=-122.4193&limit=20', None),
+        ('api_venues_near_radius', 'GET', '/api/venues/near?lat=37.7793&lon=-122.4193&radius=2', None),
+        ('api_venues_near_city', 'GET', f'/api/venues/near?city={venue.city}&state={venue.state}&radius=25&limit=500', None),
+        ('api_artists', 'GET', '/api/artists', None),
+        ('api_artist', 'GET', f'/api/artists/{artist_id}', None),
+        ('api_available_artists', 'GET', f'/api/artists/available?{night}&genre=Jazz', None),
+        ('api_artist_free_slots', 'GET', f'/api/artists/{artist_id}/free_slots?{month}', None),
+        ('api_shows', 'GET', '/api/shows', None),
+        ('api_shows_window', 'GET', f'/api/shows?from={year}-01-01&to={year}-01-31', None),
+    ]
+
+
+def write_routes():
+    venue = {
+        'name': 'Benchmark Venue', 'city': 'San Francisco', 'state': 'CA', 'address': '1 Main St',
+        'phone': '415-555-0100', 'genres': ['Jazz', 'Folk'], 'seeking_talent': 'No',
+        'image_link': 'https://example.com/v.jpg', 'website': 'https://example.com',
+        'facebook_link': 'https://www.facebook.com/example',
+    }
+    artist = dict(venue, name='Benchmark Artist', seeking_venue='No')
+    del artist['address'], artist['seeking_talent']
+    routes = [
+        ('create_venue_submission', 'POST', '/venues/create', venue),
+        ('create_artist_submission', 'POST', '/artists/create', artist),
+    ]
+    # The views catch their own errors and answer 200 either way, so each write
+    # is checked in the database: every create adds one row with its name
+    checks = {
+        'create_venue_submission': RowsAdded(Venue.query.filter(Venue.name == venue['name']), 1),
+        'create_artist_submission': RowsAdded(Artist.query.filter(Artist.name == artist['name']), 1),
+    }
+    # booking the busiest venue over one of its shows is turned down, so creates nothing
+    booked = db.session.query(Show).filter(Show.venue_id == busiest(Venue, Show.venue_id)).first()
+    if booked:
+        show = {'venue_id': booked.venue_id, 'artist_id': booked.artist_id,
+                'start_time': f'{booked.start_time:%Y-%m-%d %H:%M:%S}', 'duration': booked.duration}
+        routes.append(('create_show_conflict', 'POST', '/shows/create', show))
+        checks['create_show_conflict'] = RowsAdded(
+            Show.query.filter(Show.venue_id == booked.venue_id, Show.start_time == booked.start_time), 0,
+            flashed='is already booked')
+    return routes, checks
+
+
+class RowsAdded(object):
+    """Check of a write route: each request adds `added` rows matching `query`
+    and, if given, flashes a message containing `flashed`."""
+
+    def __init__(self, query, added, flashed=None):
+        self.query = query
+        self.added = added
+        self.flashed = flashed
+        self.expected = query.count()
+
+    def __call__(self, method, path, response):
+        self.expected += self.added
+        rows = self.query.count()
+        if rows != self.expected:
+            raise RuntimeError(f'{method} {path} left {rows} matching row(s), expected {self.expected}')
+        if self.flashed and self.flashed not in response.get_data(as_text=True):
+            raise RuntimeError(f'{method} {path} did not say "{self.flashed}"')
+
+
+def measure(client, method, path, data, iterations, counter, check=None):
+    latencies = []
+    queries = 0
+    for _ in range(iterations):
+        counter[0] = 0
+        started = time.perf_counter()
+        response = client.open(path, method=method, data=data)
+        latencies.append((time.perf_counter() - started) * 1000)
+        queries += counter[0]
+        verify(method, path, response, check)
+
+    tracemalloc.start()
+    response = client.open(path, method=method, data=data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    verify(method, path, response, check)
+
+    percentiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        'iterations': iterations,
+        'p50_ms': round(percentiles[49], 3),
+        'p90_ms': round(percentiles[89], 3),
+        'p99_ms': round(percentiles[98], 3),
+        'max_ms': round(max(latencies), 3),
+        'queries': queries / iterations,
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def verify(method, path, response, check=None):
+    if response.status_code >= 400:
+        raise RuntimeError(f'{method} {path} returned {response.status_code}')
+    if check is not None:
+        check(method, path, response)
+
+
+def cleanup():
+    # remove the rows the write routes created, and their genres
+    for model in (Venue, Artist):
+        for row in model.query.filter(model.name.like('Benchmark %')).all():
+            db.session.delete(row)
+    db.session.commit()
+
+
+def current_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=os.path.dirname(RESULTS_DIR),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as baseline_file:
+        baseline = json.load(baseline_file)['routes']
+    print(f'\nChange against {baseline_path}:')
+    for name, result in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        change = (result['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 if before['p50_ms'] else 0
+        print(f'  {name:28} p50 {before["p50_ms"]:9.2f} -> {result["p50_ms"]:9.2f} ms ({change:+.0f}%)'
+              f'  queries {before["queries"]:g} -> {result["queries"]:g}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--route', action='append', help='only run the named route(s)')
+    parser.add_argument('--cache', action='store_true', help='keep the response cache switched on')
+    parser.add_argument('--no-writes', action='store_true', help='skip the routes that write')
+    parser.add_argument('--compare', metavar='RESULTS_JSON', help='earlier results to compare against')
+    args = parser.parse_args()
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    if not args.cache:
+        response_cache.backend = NullCache()
+
+    counter = [0]
+    results = {}
+    with app.app_context():
+        def count(*_):
+            counter[0] += 1
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', count)
+
+        routes = read_routes()
+        checks = {}
+        if not args.no_writes:
+            writes, checks = write_routes()
+            routes += writes
+        client = app.test_client()
+        try:
+            for name, method, path, data in routes:
+                if args.route and name not in args.route:
+                    continue
+                results[name] = measure(client, method, path, data, args.iterations, counter, checks.get(name))
+                result = results[name]
+                print(f'{name:28} p50 {result["p50_ms"]:9.2f} ms  p90 {result["p90_ms"]:9.2f} ms  '
+                      f'p99 {result["p99_ms"]:9.2f} ms  queries {result["queries"]:6g}  peak {result["peak_kb"]:9.1f} KiB')
+        finally:
+            if not args.no_writes:
+                cleanup()
+
+        database = db.engine.url.render_as_string(hide_password=True)
+        shows = db.session.query(func.count(Show.id)).scalar()
+
+    commit = current_commit()
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f'{datetime.now():%Y%m%d-%H%M%S}-{commit}.json')
+    with open(path, 'w') as results_file:
+        json.dump({'commit': commit, 'database': database, 'shows': shows,
+                   'iterations': args.iterations, 'routes': results}, results_file, indent=2)
+    print(f'\nSaved {path}')
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""Compare the throughput of concurrent searches under a WSGI and an ASGI server.
+
+  $ pip install gunicorn uvicorn asgiref
+  $ DATABASE_URL=postgresql://localhost:5432/fyyur_bench python benchmark_concurrency.py --workers 2 --concurrency 64
+
+Serves the app with `gunicorn app:app` (sync workers) and then with
+`uvicorn asgi:application`, each with the same number of worker processes.
+Both are driven by --concurrency clients for --duration seconds, cycling
+through the venue and artist searches (pages and /api/). Requests per
+second, latency percentiles and errors of each mode are printed and saved
+to benchmarks/<timestamp>-<commit>-concurrency.json.
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import statistics
+import subprocess
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlencode
+
+from benchmark import RESULTS_DIR, current_commit
+
+TERMS = ['the', 'band', 'music', 'a', 'hall', 'jazz', 'club', 'wolves']
+FORM = {'Content-Type': 'application/x-www-form-urlencoded'}
+
+
+def requests():
+    for term in TERMS:
+        yield 'POST', '/venues/search', urlencode({'search_term': term}), FORM
+        yield 'POST', '/artists/search', urlencode({'search_term': term}), FORM
+        yield 'GET', '/api/venues/search?' + urlencode({'q': term}), None, {}
+        yield 'GET', '/api/artists/search?' + urlencode({'q': term}), None, {}
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+def start(mode, target, port, workers):
+    if mode == 'sync':
+        command = ['gunicorn', '--workers', str(workers), '--bind', f'127.0.0.1:{port}', target]
+    else:
+        command = ['uvicorn', '--workers', str(workers), '--port', str(port),
+                   '--no-access-log', '--log-level', 'warning', target]
+    server = subprocess.Popen(command, cwd=os.path.dirname(os.path.abspath(__file__)))
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f'{" ".join(command)} exited with {server.returncode}')
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            connection.request('GET', '/api/venues/search?q=a')
+            if connection.getresponse().status == 200:
+                return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f'{" ".join(command)} did not start')
+
+
+def drive(port, duration, concurrency):
+    # concurrency clients, each sending one request after the other for duration seconds
+    batch = list(requests())
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(offset):
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        done = []
+        failed = 0
+        number = offset
+        while time.perf_counter() < deadline:
+            method, path, body, headers = batch[number % len(batch)]
+            number += 1
+            started = time.perf_counter()
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                ok = False
+            if ok:
+                done.append((time.perf_counter() - started) * 1000)
+            else:
+                failed += 1
+        with lock:
+            latencies.extend(done)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client, args=(offset,)) for offset in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    percentiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0] * 99
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'requests_per_s': round(len(latencies) / duration, 1),
+        'p50_ms': round(percentiles[49], 3),
+        'p90_ms': round(percentiles[89], 3),
+        'p99_ms': round(percentiles[98], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=2, help='worker processes in each mode')
+    parser.add_argument('--concurrency', type=int, default=64, help='clients sending requests at once')
+    parser.add_argument('--duration', type=float, default=15, help='seconds measured in each mode')
+    parser.add_argument('--warmup', type=float, default=3, help='seconds of load before measuring')
+    parser.add_argument('--sync-app', default='app:app')
+    parser.add_argument('--async-app', default='asgi:application')
+    args = parser.parse_args()
+
+    results = {}
+    for mode, target in (('sync', args.sync_app), ('async', args.async_app)):
+        port = free_port()
+        server = start(mode, target, port, args.workers)
+        try:
+            drive(port, args.warmup, args.concurrency)
+            results[mode] = result = drive(port, args.duration, args.concurrency)
+        finally:
+            server.terminate()
+            server.wait()
+        print(f'{mode:6} {result["requests_per_s"]:9.1f} req/s  p50 {result["p50_ms"]:8.2f} ms  '
+              f'p90 {result["p90_ms"]:8.2f} ms  p99 {result["p99_ms"]:8.2f} ms  errors {result["errors"]}')
+
+    if results['sync']['requests_per_s']:
+        print(f'async/sync throughput: {results["async"]["requests_per_s"] / results["sync"]["requests_per_s"]:.2f}x')
+
+    commit = current_commit()
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f'{datetime.now():%Y%m%d-%H%M%S}-{commit}-concurrency.json')
+    with open(path, 'w') as results_file:
+        json.dump({'commit': commit, 'workers': args.workers, 'concurrency': args.concurrency,
+                   'duration': args.duration, 'modes': results}, results_file, indent=2)
+    print(f'\nSaved {path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""Profile how long a fresh process takes to import the app.
+
+  $ python benchmark_startup.py
+  $ python benchmark_startup.py --compare benchmarks/<earlier run>-startup.json
+
+Imports the app --runs times, each in a new interpreter under
+`python -X importtime`, and times `flask --help` the same way, which is
+what a booting worker and every CLI invocation pay before doing anything.
+Prints the median times and the modules the app imports directly, ordered
+by their cumulative import time. The results are written to
+benchmarks/<timestamp>-<commit>-startup.json.
+The app itself is not imported here, so the numbers are those of a cold start.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks')
+
+COMMANDS = {
+    'import app': [sys.executable, '-X', 'importtime', '-c', 'import app'],
+    'flask --help': [sys.executable, '-X', 'importtime', '-m', 'flask', '--app', 'app', '--help'],
+}
+
+
+def current_commit():
+    # not imported from benchmark.py, which imports the app
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+# top-level imports of the interpreter itself, the same with or without the app
+INTERPRETER_MODULES = {'site', 'encodings', 'sitecustomize', 'usercustomize'}
+
+
+def parse_importtime(output):
+    # {module: cumulative microseconds} of the modules imported directly by the
+    # top-level ones, i.e. what the app's own modules pull in. importtime lists
+    # a module after the modules it imported, indented one level deeper.
+    modules = {}
+    children = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            children.append((name.strip(), int(cumulative)))
+        elif depth == 0:
+            if name.strip() not in INTERPRETER_MODULES:
+                for child, child_cumulative in children:
+                    modules[child] = modules.get(child, 0) + child_cumulative
+            children = []
+    return modules
+
+
+def measure(command, runs):
+    times = []
+    modules = {}
+    for _ in range(runs):
+        started = time.perf_counter()
+        completed = subprocess.run(command, cwd=ROOT, capture_output=True, text=True)
+        times.append((time.perf_counter() - started) * 1000)
+        if completed.returncode != 0:
+            raise RuntimeError(f'{" ".join(command)} failed:\n{completed.stderr}')
+        for name, cumulative in parse_importtime(completed.stderr).items():
+            modules.setdefault(name, []).append(cumulative / 1000)
+    return {
+        'median_ms': round(statistics.median(times), 1),
+        'min_ms': round(min(times), 1),
+        'modules_ms': {name: round(statistics.median(values), 1)
+                       for name, values in sorted(modules.items(), key=lambda item: -statistics.median(item[1]))},
+    }
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as baseline_file:
+        baseline = json.load(baseline_file)['commands']
+    print(f'\nChange against {baseline_path}:')
+    for name, result in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        change = (result['median_ms'] - before['median_ms']) / before['median_ms'] * 100
+        print(f'  {name:14} {before["median_ms"]:8.1f} -> {result["median_ms"]:8.1f} ms ({change:+.0f}%)')
+        for module in list(before['modules_ms'])[:10]:
+            after = result['modules_ms'].get(module, 0)
+            if after != before['modules_ms'][module]:
+                print(f'    {module:30} {before["modules_ms"][module]:8.1f} -> {after:8.1f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--top', type=int, default=12, help='number of imported modules listed')
+    parser.add_argument('--compare', metavar='RESULTS_JSON', help='earlier results to compare against')
+    args = parser.parse_args()
+
+    results = {}
+    for name, command in COMMANDS.items():
+        results[name] = result = measure(command, args.runs)
+        print(f'{name:14} median {result["median_ms"]:8.1f} ms  min {result["min_ms"]:8.1f} ms')
+        for module, cumulative in list(result['modules_ms'].items())[:args.top]:
+            print(f'    {module:30} {cumulative:8.1f} ms')
+
+    commit = current_commit()
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f'{datetime.now():%Y%m%d-%H%M%S}-{commit}-startup.json')
+    with open(path, 'w') as results_file:
+        json.dump({'commit': commit, 'python': sys.version.split()[0], 'runs': args.runs,
+                   'commands': results}, results_file, indent=2)
+    print(f'\nSaved {path}')
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+import csv
+import io
+import json
+import os
+import time
+
+from sqlalchemy import func, select, text
+
+
+def read_records(path, format=None):
+    """Yield (record number, dict) from a CSV (with a header row) or JSONL file, one at a time."""
+    format = format or ('jsonl' if path.endswith(('.jsonl', '.ndjson', '.json')) else 'csv')
+    with open(path, newline='', encoding='utf-8') as source:
+        if format == 'csv':
+            for number, record in enumerate(csv.DictReader(source), 1):
+                yield number, record
+        else:
+            number = 0
+            for line in source:
+                if line.strip():
+                    number += 1
+                    yield number, json.loads(line)
+
+
+def batches(records, size):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Checkpoint(object):
+    """Number of input records already loaded, kept next to the input file.
+
+    It is rewritten after every committed batch, so an interrupted import can
+    skip what is already in the database when it is run again.
+    """
+
+    def __init__(self, source_path):
+        self.path = source_path + '.progress'
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def load(self):
+        with open(self.path) as checkpoint_file:
+            return json.load(checkpoint_file)['records']
+
+    def save(self, records):
+        with open(self.path + '.tmp', 'w') as checkpoint_file:
+            json.dump({'records': records}, checkpoint_file)
+        os.replace(self.path + '.tmp', self.path)
+
+    def clear(self):
+        if self.exists():
+            os.remove(self.path)
+
+
+def reserve_ids(connection, table, count):
+    # Primary keys for rows whose children (genres) are inserted in the same
+    # batch. Postgres hands them out from the table's sequence, so concurrent
+    # inserts stay safe; elsewhere they continue from the current maximum.
+    if connection.dialect.name == 'postgresql':
+        return [id for id, in connection.execute(
+            text('SELECT nextval(pg_get_serial_sequence(:table, \'id\')) FROM generate_series(1, :count)'),
+            {'table': f'"{table.name}"', 'count': count})]
+    first = (connection.execute(select(func.max(table.c.id))).scalar() or 0) + 1
+    return list(range(first, first + count))
+
+
+def insert_rows(connection, table, rows):
+    """Insert rows (dicts with the same keys) in one round trip.
+
+    Uses COPY on Postgres with psycopg2 and a single executemany INSERT elsewhere.
+    """
+    if not rows:
+        return
+    columns = list(rows[0])
+    cursor = None
+    if connection.dialect.name == 'postgresql':
+        cursor = connection.connection.cursor()
+    if cursor is None or not hasattr(cursor, 'copy_expert'):
+        connection.execute(table.insert(), rows)
+        return
+
+    # QUOTE_NONNUMERIC keeps '' (quoted) apart from NULL (None, written unquoted)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC)
+    for row in rows:
+        writer.writerow([row[column] for column in columns])
+    buffer.seek(0)
+    column_list = ', '.join(f'"{column}"' for column in columns)
+    cursor.copy_expert(f'COPY "{table.name}" ({column_list}) FROM STDIN WITH (FORMAT csv)', buffer)
+
+
+def with_genres(rows, genre_rows):
+    """Attach genres to rows, both read in owner id order, as the row's last column.
+
+    A merge of the two ordered cursors: neither is held in memory and no
+    statement is run per row.
+    """
+    genre_rows = iter(genre_rows)
+    pending = next(genre_rows, None)
+    for row in rows:
+        genres = []
+        while pending is not None and pending[0] <= row[0]:
+            if pending[0] == row[0]:
+                genres.append(pending[1])
+            pending = next(genre_rows, None)
+        yield tuple(row) + (genres,)
+
+
+def _text(value):
+    if isinstance(value, list):
+        return ','.join(value)
+    return '' if value is None else str(value)
+
+
+def csv_chunks(columns, rows, chunk_size=1000):
+    """Yield a CSV document (header first) as strings of chunk_size rows each."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for number, row in enumerate(rows, 1):
+        writer.writerow([_text(value) for value in row])
+        if number % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def jsonl_chunks(columns, rows, chunk_size=1000):
+    """Yield one JSON object per row and line, as strings of chunk_size lines each."""
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(columns, row)), default=str))
+        if len(lines) == chunk_size:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+EXPORT_FORMATS = {
+    'csv': (csv_chunks, 'text/csv'),
+    'jsonl': (jsonl_chunks, 'application/x-ndjson'),
+}
+
+
+class Throughput(object):
+    # running count of loaded and rejected records and the load rate
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.loaded = 0
+        self.rejected = 0
+
+    def add(self, loaded, rejected):
+        self.loaded += loaded
+        self.rejected += rejected
+
+    def __str__(self):
+        elapsed = time.perf_counter() - self.started
+        rate = self.loaded / elapsed if elapsed else 0
+        return f'{self.loaded} loaded, {self.rejected} rejected, {elapsed:.1f}s, {rate:.0f} rows/s'
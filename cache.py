@@ -0,0 +1,199 @@
+import functools
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from flask import Response, make_response, request, session
+from werkzeug.http import is_resource_modified
+
+class CacheBackend(object):
+    """Key/value store used by ResponseCache.
+
+    Subclass this to keep cached pages in a store shared by every worker.
+    Values are byte strings; a `ttl` of None means no expiry.
+    """
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, ttl=None):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+
+class NullCache(CacheBackend):
+    # caching switched off
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def delete(self, key):
+        pass
+
+
+class LRUCache(CacheBackend):
+    # in-process store, least recently used entries are dropped past max_entries
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires is not None and expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class RedisCache(CacheBackend):
+    # shared store; needs the redis package
+
+    def __init__(self, url, prefix='fyyur:'):
+        import redis
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        return self._client.get(self.prefix + key)
+
+    def set(self, key, value, ttl=None):
+        self._client.set(self.prefix + key, value, ex=int(ttl) if ttl else None)
+
+    def delete(self, key):
+        self._client.delete(self.prefix + key)
+
+
+class ResponseCache(object):
+    """Caches whole GET responses of the views decorated with cached().
+
+    Every cached view names the tags its page depends on, e.g. 'venue:{venue_id}'.
+    Each tag has a generation token that is part of the cache key; invalidate()
+    replaces the token, so every page depending on that tag, whatever its query
+    string, is missed from then on and re-rendered on the next request.
+
+    Views given a validator answer conditional GETs. A cached page is stored
+    with the ETag it was rendered under, so a hit is answered, 304 or not,
+    without touching the database; on a miss the validator's ETag can answer
+    304 before the view runs.
+
+    With the 'lru' backend invalidate() only reaches the worker that calls it,
+    so other workers may serve a page up to CACHE_TTL seconds old; only the
+    shared 'redis' backend keeps every worker current after a write.
+    """
+
+    def __init__(self, app=None):
+        self.backend = NullCache()
+        self.ttl = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CACHE_BACKEND', 'lru')
+        app.config.setdefault('CACHE_MAX_ENTRIES', 1024)
+        app.config.setdefault('CACHE_TTL', 300)
+        app.config.setdefault('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+
+        backend = app.config['CACHE_BACKEND']
+        if isinstance(backend, CacheBackend):
+            self.backend = backend
+        elif backend == 'lru':
+            self.backend = LRUCache(app.config['CACHE_MAX_ENTRIES'])
+        elif backend == 'redis':
+            self.backend = RedisCache(app.config['CACHE_REDIS_URL'])
+        elif backend in (None, 'null'):
+            self.backend = NullCache()
+        else:
+            raise ValueError(f'Unknown CACHE_BACKEND {backend!r}')
+        self.ttl = app.config['CACHE_TTL']
+        app.extensions['response_cache'] = self
+
+    def cached(self, *tags, validator=None):
+        """Serves the view's GET responses from the cache.
+
+        `validator`, if given, gets the view arguments and returns the page's
+        ETag, or None when the page cannot be validated (the view then runs
+        uncached, e.g. to return a 404). Responses carry the ETag and no-cache,
+        so browsers revalidate on every visit. Pages are validated by ETag
+        only: a Last-Modified would not move when rows are deleted, and
+        If-Modified-Since alone would then keep answering 304 with a stale page.
+        """
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(**kwargs):
+                # pages carrying flashed messages are personal, never serve or store them
+                if request.method != 'GET' or session.get('_flashes'):
+                    return view(**kwargs)
+
+                key = self._key([tag.format(**kwargs) for tag in tags])
+                cached = self.backend.get(key)
+                if cached is not None:
+                    mimetype, etag, body = cached.split(b'\n', 2)
+                    return self._validated(Response(body, mimetype=mimetype.decode()), etag.decode())
+
+                etag = ''
+                if validator is not None:
+                    etag = validator(**kwargs)
+                    if etag is None:
+                        return view(**kwargs)
+                    if not is_resource_modified(request.environ, etag=etag):
+                        return self._validated(Response(status=304), etag)
+
+                response = make_response(view(**kwargs))
+                if response.status_code != 200:
+                    return response
+                if not response.is_streamed:
+                    self.backend.set(key, b'\n'.join([response.mimetype.encode(), etag.encode(), response.get_data()]),
+                                     self.ttl)
+                return self._validated(response, etag)
+            return wrapper
+        return decorator
+
+    def invalidate(self, *tags):
+        for tag in tags:
+            self.backend.set('tag:' + tag, uuid.uuid4().hex.encode())
+
+    def _key(self, tags):
+        generations = []
+        for tag in tags:
+            generation = self.backend.get('tag:' + tag)
+            if generation is None:
+                # never seen (or evicted): start a fresh generation so no older page can match
+                generation = uuid.uuid4().hex.encode()
+                self.backend.set('tag:' + tag, generation)
+            generations.append(generation.decode())
+        return ':'.join(['page:' + request.full_path] + generations)
+
+    def _validated(self, response, etag):
+        # pages of views without a validator are sent as they are
+        if not etag:
+            return response
+        if response.status_code == 200 and not is_resource_modified(request.environ, etag=etag):
+            response = Response(status=304)
+        response.set_etag(etag)
+        response.cache_control.no_cache = True
+        return response
@@ -0,0 +1,146 @@
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class GzipEncoder(object):
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data, flush=False):
+        # flush=True ends the output on a byte boundary the client can decode up to
+        return self._compressor.compress(data) + (self._compressor.flush(zlib.Z_SYNC_FLUSH) if flush else b'')
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class BrotliEncoder(object):
+    def __init__(self, level):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data, flush=False):
+        return self._compressor.process(data) + (self._compressor.flush() if flush else b'')
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class ZstdEncoder(object):
+    def __init__(self, level):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data, flush=False):
+        output = self._compressor.compress(data)
+        if flush:
+            output += self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        return output
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+# Content-Encoding: encoder, for the encodings whose library is installed
+ENCODERS = {'gzip': GzipEncoder}
+if brotli is not None:
+    ENCODERS['br'] = BrotliEncoder
+if zstandard is not None:
+    ENCODERS['zstd'] = ZstdEncoder
+
+
+def compressed_chunks(chunks, encoder):
+    # each chunk is sent as soon as it is compressed, so streams stay streams
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            if chunk:
+                yield encoder.compress(chunk, flush=True)
+        yield encoder.finish()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+class ResponseCompression(object):
+    """Compresses responses with the best encoding the client accepts.
+
+    Responses of COMPRESS_MIMETYPES are compressed with the first of
+    COMPRESS_ENCODINGS that is in Accept-Encoding and installed (gzip always
+    is; br needs brotli, zstd needs zstandard), at the level COMPRESS_LEVELS
+    gives for their mimetype, or for '*'. Responses of a known size under
+    COMPRESS_MIN_SIZE bytes are sent as they are: buffered ones, and streamed
+    ones with a Content-Length. Other streamed responses are compressed
+    chunk by chunk. Files sent with send_file, such as the
+    precompressed static assets, are left alone.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESS', True)
+        app.config.setdefault('COMPRESS_ENCODINGS', ('br', 'zstd', 'gzip'))
+        app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+        app.config.setdefault('COMPRESS_MIMETYPES', ('text/html', 'text/css', 'text/csv', 'text/javascript',
+                                                     'application/javascript', 'application/json',
+                                                     'application/x-ndjson'))
+        app.config.setdefault('COMPRESS_LEVELS', {'*': {'gzip': 6, 'br': 4, 'zstd': 3}})
+        if not app.config['COMPRESS']:
+            return
+
+        self.encodings = [encoding for encoding in app.config['COMPRESS_ENCODINGS'] if encoding in ENCODERS]
+        self.min_size = app.config['COMPRESS_MIN_SIZE']
+        self.mimetypes = set(app.config['COMPRESS_MIMETYPES'])
+        self.levels = app.config['COMPRESS_LEVELS']
+        app.after_request(self.compress)
+        app.extensions['response_compression'] = self
+
+    def level(self, mimetype, encoding):
+        return self.levels.get(mimetype, {}).get(encoding, self.levels['*'][encoding])
+
+    def compress(self, response):
+        if (response.mimetype not in self.mimetypes or response.direct_passthrough
+                or 'Content-Encoding' in response.headers or response.status_code in (204, 206, 304)
+                or request.method == 'HEAD'):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = request.accept_encodings.best_match(self.encodings)
+        if encoding is None:
+            return response
+
+        # the size of streamed bodies is known only from their Content-Length,
+        # which error pages from abort() have; generators are not read ahead
+        if response.is_streamed:
+            size = response.content_length
+        else:
+            size = response.calculate_content_length()
+        if size is not None and size < self.min_size:
+            return response
+
+        encoder = ENCODERS[encoding](self.level(response.mimetype, encoding))
+        if response.is_streamed:
+            response.response = compressed_chunks(response.response, encoder)
+            response.headers.pop('Content-Length', None)
+        else:
+            response.set_data(encoder.compress(response.get_data()) + encoder.finish())
+
+        response.headers['Content-Encoding'] = encoding
+        # the compressed bytes differ, but the representation is the same:
+        # a weak ETag still matches If-None-Match, so 304s keep working
+        etag, _ = response.get_etag()
+        if etag:
+            response.set_etag(etag, weak=True)
+        return response
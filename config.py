@@ -10,4 +10,110 @@ DEBUG = True
 
 
 # TODO IMPLEMENT DATABASE URL
-SQLALCHEMY_DATABASE_URI = 'postgres://localhost:5432/fyyur'
+# DATABASE_URL points scripts such as seed.py and benchmark.py at another database
+SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'postgres://localhost:5432/fyyur')
+
+# Connection pool of each engine, per worker process: DATABASE_POOL_SIZE
+# connections kept open plus up to DATABASE_MAX_OVERFLOW more under load.
+# Connections are replaced after DATABASE_POOL_RECYCLE seconds and, with
+# pre-ping, checked before use so a dropped connection never fails a request.
+DATABASE_POOL_SIZE = int(os.environ.get('DATABASE_POOL_SIZE', 5))
+DATABASE_MAX_OVERFLOW = int(os.environ.get('DATABASE_MAX_OVERFLOW', 10))
+DATABASE_POOL_RECYCLE = 1800
+DATABASE_POOL_PRE_PING = True
+SQLALCHEMY_ENGINE_OPTIONS = {
+    'pool_size': DATABASE_POOL_SIZE,
+    'max_overflow': DATABASE_MAX_OVERFLOW,
+    'pool_recycle': DATABASE_POOL_RECYCLE,
+    'pool_pre_ping': DATABASE_POOL_PRE_PING,
+}
+
+# Optional read replica. GET requests read from it, everything else uses
+# the primary; a client that just wrote reads from the primary for
+# REPLICA_READ_YOUR_WRITES seconds. Pool counts are served at
+# POOL_METRICS_URL to the requests allowed to see METRICS_URL.
+DATABASE_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL')
+SQLALCHEMY_BINDS = {'replica': DATABASE_REPLICA_URL} if DATABASE_REPLICA_URL else {}
+REPLICA_READ_YOUR_WRITES = 5
+POOL_METRICS_URL = '/_internal/pools'
+
+
+# Number of past shows loaded at a time on venue and artist pages
+PAST_SHOWS_PER_PAGE = 10
+
+# Default and maximum number of shows per page on /shows
+SHOWS_PER_PAGE = 30
+SHOWS_MAX_PER_PAGE = 200
+
+# Maximum number of venues or artists listed for a search
+SEARCH_RESULTS_LIMIT = 50
+
+# Default number of names suggested while typing in a search box
+SUGGESTIONS_LIMIT = 8
+
+# Compiled templates are shared by the workers of a host through files in
+# TEMPLATE_BYTECODE_CACHE_DIR (None: the user's temporary directory). Each
+# worker keeps up to FRAGMENT_CACHE_MAX_ENTRIES tiles rendered by {% cache %}.
+TEMPLATE_BYTECODE_CACHE = True
+TEMPLATE_BYTECODE_CACHE_DIR = None
+FRAGMENT_CACHE_MAX_ENTRIES = 4096
+
+# Manifest written by `flask build-assets`, relative to static/. The hashed files
+# it lists are cached by browsers for STATIC_MAX_AGE seconds.
+STATIC_MANIFEST = 'dist/manifest.json'
+STATIC_MAX_AGE = 365 * 24 * 3600
+
+# Responses of these mimetypes are compressed with the first of COMPRESS_ENCODINGS
+# the client accepts (br needs brotli, zstd needs zstandard; gzip always works),
+# unless smaller than COMPRESS_MIN_SIZE bytes. COMPRESS_LEVELS trades CPU for
+# bandwidth per mimetype, falling back to '*'; streamed exports favour speed.
+COMPRESS = True
+COMPRESS_ENCODINGS = ('br', 'zstd', 'gzip')
+COMPRESS_MIN_SIZE = 1024
+COMPRESS_MIMETYPES = ('text/html', 'text/css', 'text/csv', 'text/javascript', 'application/javascript',
+                      'application/json', 'application/x-ndjson')
+COMPRESS_LEVELS = {
+    '*': {'gzip': 6, 'br': 4, 'zstd': 3},
+    'text/csv': {'gzip': 1, 'br': 1, 'zstd': 1},
+    'application/x-ndjson': {'gzip': 1, 'br': 1, 'zstd': 1},
+}
+
+# Cached GET pages: 'lru' keeps them in each worker, 'redis' shares them
+# between workers through CACHE_REDIS_URL, 'null' turns caching off. Only
+# 'redis' makes a write seen by every worker at once: with 'lru', the pages
+# and JSON API of other workers can lag up to CACHE_TTL seconds. CACHE_TTL
+# (seconds) also bounds how long a show stays listed as upcoming once it has
+# started, unless `flask refresh-show-counts` runs sooner with 'redis'.
+CACHE_BACKEND = 'lru'
+CACHE_MAX_ENTRIES = 1024
+CACHE_TTL = 300
+
+# Default and maximum number of records per page of the /api/ list endpoints.
+# JSON is encoded with orjson when it is installed.
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 500
+
+# Farthest, in km, /api/venues/near looks for venues
+NEARBY_MAX_RADIUS_KM = 500
+
+# Longest time range, in days, the availability endpoints search at once
+AVAILABILITY_MAX_DAYS = 31
+
+# Rows read from the database at a time by the /export streams and `flask export`
+EXPORT_BATCH_SIZE = 1000
+
+# Per-request query counts and timings, served at METRICS_URL to requests
+# sending "Authorization: Bearer <METRICS_TOKEN>". Requests running one
+# statement QUERY_N_PLUS_ONE_THRESHOLD times or more are logged as likely
+# N+1s; QUERY_LOG_REQUESTS also logs a summary of every request (to
+# error.log when not in debug mode).
+QUERY_METRICS = True
+QUERY_N_PLUS_ONE_THRESHOLD = 5
+QUERY_LOG_REQUESTS = False
+METRICS_URL = '/_internal/metrics'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+# Without a token the metrics are only served with METRICS_WITHOUT_TOKEN, to
+# local addresses. That checks the address the request came from, so it
+# assumes no reverse proxy: behind nginx, or Heroku's router in front of
+# gunicorn, every request comes from the proxy and would be let through.
+METRICS_WITHOUT_TOKEN = False
@@ -1,16 +1,19 @@
 from fabric.api import local, settings, abort
-from fabric.contrib.console import confirm
 
 # prepare for deployment
 
 
 def test():
+    # the tests, then one pass of the benchmark, which fails on any route that
+    # errors or write that does not take
     with settings(warn_only=True):
-        result = local(
-            "python test_tasks.py -v && python test_users.py -v", capture=True
-        )
-    if result.failed and not confirm("Tests failed. Continue?"):
-        abort("Aborted at user request.")
+        result = local("python -m pytest -q && python benchmark.py --iterations 1")
+    if result.failed:
+        abort("Tests or benchmark checks failed.")
+
+
+def benchmark():
+    local("python benchmark.py")
 
 
 def commit():
@@ -39,9 +42,7 @@ def heroku():
 
 
 def heroku_test():
-    local(
-        "heroku run python test_tasks.py -v && heroku run python test_users.py -v"
-    )
+    local("heroku run python benchmark.py --iterations 1 --no-writes")
 
 
 def deploy():
@@ -0,0 +1,54 @@
+import functools
+from datetime import datetime
+
+# babel is imported on the first call rather than with the app
+
+# Named formats accepted by format_datetime; anything else is used as a babel pattern.
+FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+
+@functools.lru_cache(maxsize=None)
+def compiled_pattern(format):
+    import babel.dates
+    return babel.dates.parse_pattern(FORMATS.get(format, format))
+
+
+@functools.lru_cache(maxsize=None)
+def parsed_locale(locale):
+    from babel import Locale
+    return Locale.parse(locale)
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_datetime(value):
+    # ISO strings (what str(datetime) gives) avoid the much slower dateutil parser
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        import dateutil.parser
+        return dateutil.parser.parse(value)
+
+
+@functools.lru_cache(maxsize=None)
+def default_locale():
+    import babel.dates
+    return babel.dates.LC_TIME or 'en_US_POSIX'
+
+
+@functools.lru_cache(maxsize=4096)
+def _format(value, format, locale):
+    return compiled_pattern(format).apply(value, parsed_locale(locale))
+
+
+def format_datetime(value, format='medium', locale=None):
+    """Format a datetime (or a date string) with a named format or a babel pattern.
+
+    Patterns and locales are compiled once; repeated (timestamp, format, locale)
+    combinations, common on listing pages, are answered from a cache.
+    """
+    if isinstance(value, str):
+        value = parse_datetime(value)
+    return _format(value, format, locale or default_locale())
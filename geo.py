@@ -0,0 +1,132 @@
+import csv
+import math
+import os
+
+# Mean radius of the Earth, for great-circle distances
+EARTH_RADIUS_KM = 6371.0088
+
+# Characters of the geohashes stored for each venue; 9 is a cell of about 5 x 5 m
+GEOHASH_PRECISION = 9
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# The bundled table of city centres, used for venues without exact coordinates
+CITY_CENTROIDS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'city_centroids.csv')
+
+
+def location_key(city, state):
+    return ' '.join((city or '').split()).lower(), (state or '').strip().upper()
+
+
+class CityCentroids(object):
+    """(latitude, longitude) of the centre of a city, from an offline CSV table.
+
+    The file has city, state, latitude and longitude columns. It is read on
+    the first lookup; city names are matched ignoring case and extra spaces.
+    """
+
+    def __init__(self, path=CITY_CENTROIDS):
+        self.path = path
+        self._centroids = None
+
+    def load(self):
+        with open(self.path, newline='') as centroids_file:
+            return {location_key(row['city'], row['state']): (float(row['latitude']), float(row['longitude']))
+                    for row in csv.DictReader(centroids_file)}
+
+    def get(self, city, state):
+        if self._centroids is None:
+            self._centroids = self.load()
+        return self._centroids.get(location_key(city, state))
+
+
+def encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    # the geohash of a point: bits alternate between halving the longitude
+    # and the latitude range, five bits to a character
+    ranges = [[-180.0, 180.0], [-90.0, 90.0]]
+    values = (normalized_longitude(longitude), latitude)
+    geohash = []
+    bits = 0
+    for bit in range(precision * 5):
+        low_high = ranges[bit % 2]
+        middle = (low_high[0] + low_high[1]) / 2
+        if values[bit % 2] >= middle:
+            bits = bits * 2 + 1
+            low_high[0] = middle
+        else:
+            bits = bits * 2
+            low_high[1] = middle
+        if bit % 5 == 4:
+            geohash.append(BASE32[bits])
+            bits = 0
+    return ''.join(geohash)
+
+
+def prefix_range(prefix):
+    # (low, high) such that the geohashes starting with prefix are those in
+    # [low, high), or in [low, ...) when high is None. Only geohash characters
+    # are compared, which sort the same in every collation.
+    stem = prefix
+    while stem and stem[-1] == BASE32[-1]:
+        stem = stem[:-1]
+    if not stem:
+        return prefix, None
+    return prefix, stem[:-1] + BASE32[BASE32.index(stem[-1]) + 1]
+
+
+def cell_size(precision):
+    # (latitude, longitude) degrees covered by a geohash of that many characters
+    bits = precision * 5
+    return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** (bits - bits // 2)
+
+
+def normalized_longitude(longitude):
+    return (longitude + 180.0) % 360.0 - 180.0
+
+
+def distance_km(latitude, longitude, other_latitude, other_longitude):
+    # great-circle distance, by the haversine formula
+    phi, other_phi = math.radians(latitude), math.radians(other_latitude)
+    half_chord = (math.sin((other_phi - phi) / 2) ** 2 +
+                  math.cos(phi) * math.cos(other_phi) * math.sin(math.radians(other_longitude - longitude) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(half_chord)))
+
+
+def bounding_box(latitude, longitude, radius_km):
+    # (south, north, west, east) degrees around every point within radius_km;
+    # west and east may pass +-180, and span the globe around the poles
+    degrees = math.degrees(radius_km / EARTH_RADIUS_KM)
+    south, north = max(latitude - degrees, -90.0), min(latitude + degrees, 90.0)
+    widest = math.cos(math.radians(max(abs(south), abs(north))))
+    if widest <= 0 or degrees / widest >= 180.0:
+        return south, north, -180.0, 180.0
+    return south, north, longitude - degrees / widest, longitude + degrees / widest
+
+
+def steps(low, high, step):
+    # low, high and points at most step apart between them, so that every cell
+    # of that size overlapping [low, high] contains one of them
+    count = int(math.ceil((high - low) / step))
+    return [low + step * i for i in range(count)] + [high]
+
+
+def covering_prefixes(latitude, longitude, radius_km, max_cells=32):
+    """Geohash prefixes of the cells covering every point within radius_km.
+
+    Uses the longest prefixes (the smallest cells) for which at most
+    max_cells of them cover the bounding box of the circle, so that a
+    search reads one short index range per cell.
+    """
+    south, north, west, east = bounding_box(latitude, longitude, radius_km)
+    precision = 1
+    for candidate in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size(candidate)
+        # an interval overlaps at most one cell more than its length fills
+        if (math.ceil((north - south) / height) + 1) * (math.ceil((east - west) / width) + 1) <= max_cells:
+            precision = candidate
+            break
+
+    height, width = cell_size(precision)
+    return sorted({encode(point_latitude, point_longitude, precision)
+                   for point_latitude in steps(south, north, height)
+                   for point_longitude in steps(west, east, width)})
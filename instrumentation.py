@@ -0,0 +1,169 @@
+import hmac
+import re
+import threading
+import time
+from collections import Counter
+
+from flask import abort, before_render_template, g, has_request_context, jsonify, request, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Statements differing only in literal values or IN-list length share a fingerprint.
+_IN_LIST = re.compile(r'\(\s*(\?|%\(\w+\)s|:\w+|\$\d+)(\s*,\s*(\?|%\(\w+\)s|:\w+|\$\d+))*\s*\)')
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(\.\d+)?\b")
+
+
+def fingerprint(statement):
+    statement = _LITERAL.sub('?', statement)
+    statement = _IN_LIST.sub('(?)', statement)
+    return ' '.join(statement.split())
+
+
+def pool_status(pool):
+    # connection counts of a QueuePool; other pool classes only describe themselves
+    if not hasattr(pool, 'checkedout'):
+        return {'pool': type(pool).__name__, 'status': pool.status()}
+    return {
+        'pool': type(pool).__name__,
+        'size': pool.size(),
+        'checked_in': pool.checkedin(),
+        'checked_out': pool.checkedout(),
+        'overflow': pool.overflow(),
+    }
+
+
+class QueryMetrics(object):
+    """Counts and times the SQL each request runs.
+
+    For every request it records the number of statements, time spent in the
+    database and in template rendering, and how often each statement
+    fingerprint ran. A request running one fingerprint N+1_THRESHOLD times or
+    more is flagged as a likely N+1 and logged as a warning. Totals per
+    endpoint are served as JSON at METRICS_URL, and the connection pools of
+    the Flask-SQLAlchemy engines at POOL_METRICS_URL, to requests with
+    "Authorization: Bearer <METRICS_TOKEN>". With no token they are answered
+    404, unless METRICS_WITHOUT_TOKEN opts in to serving them to
+    METRICS_ALLOWED_ADDRS. That is the connecting address, so it only
+    protects them when no reverse proxy forwards requests from the same host.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self.endpoints = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('QUERY_METRICS', True)
+        app.config.setdefault('QUERY_N_PLUS_ONE_THRESHOLD', 5)
+        app.config.setdefault('QUERY_LOG_REQUESTS', False)
+        app.config.setdefault('METRICS_URL', '/_internal/metrics')
+        app.config.setdefault('METRICS_TOKEN', None)
+        app.config.setdefault('METRICS_WITHOUT_TOKEN', False)
+        app.config.setdefault('METRICS_ALLOWED_ADDRS', ('127.0.0.1', '::1'))
+        app.config.setdefault('POOL_METRICS_URL', '/_internal/pools')
+        if not app.config['QUERY_METRICS']:
+            return
+
+        self.app = app
+        event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.add_url_rule(app.config['METRICS_URL'], 'query_metrics', self.metrics_view)
+        app.add_url_rule(app.config['POOL_METRICS_URL'], 'pool_metrics', self.pools_view)
+        app.extensions['query_metrics'] = self
+
+    def allowed(self):
+        token = self.app.config['METRICS_TOKEN']
+        if token:
+            return hmac.compare_digest(request.headers.get('Authorization', '').encode(),
+                                       f'Bearer {token}'.encode())
+        return (self.app.config['METRICS_WITHOUT_TOKEN']
+                and request.remote_addr in self.app.config['METRICS_ALLOWED_ADDRS'])
+
+    def metrics_view(self):
+        if not self.allowed():
+            abort(404)
+        with self._lock:
+            endpoints = {name: dict(stats) for name, stats in self.endpoints.items()}
+        for stats in endpoints.values():
+            stats['avg_queries'] = stats['queries'] / stats['requests']
+            stats['avg_db_ms'] = stats['db_ms'] / stats['requests']
+            stats['avg_render_ms'] = stats['render_ms'] / stats['requests']
+            stats['avg_total_ms'] = stats['total_ms'] / stats['requests']
+        return jsonify(endpoints)
+
+    def pools_view(self):
+        if not self.allowed():
+            abort(404)
+        engines = self.app.extensions['sqlalchemy'].engines
+        return jsonify({key or 'primary': pool_status(engine.pool) for key, engine in engines.items()})
+
+    def _start_request(self):
+        g.query_metrics = {
+            'started': time.perf_counter(),
+            'queries': 0,
+            'db_time': 0.0,
+            'render_time': 0.0,
+            'fingerprints': Counter(),
+        }
+
+    def _finish_request(self, response):
+        current = g.pop('query_metrics', None)
+        if current is None or request.endpoint in ('query_metrics', 'pool_metrics'):
+            return response
+
+        total_ms = (time.perf_counter() - current['started']) * 1000
+        db_ms = current['db_time'] * 1000
+        render_ms = current['render_time'] * 1000
+        threshold = self.app.config['QUERY_N_PLUS_ONE_THRESHOLD']
+        repeated = [(statement, count) for statement, count in current['fingerprints'].most_common()
+                    if count >= threshold]
+
+        with self._lock:
+            stats = self.endpoints.setdefault(request.endpoint or 'unknown', {
+                'requests': 0, 'queries': 0, 'max_queries': 0, 'db_ms': 0.0,
+                'render_ms': 0.0, 'total_ms': 0.0, 'n_plus_one': 0,
+            })
+            stats['requests'] += 1
+            stats['queries'] += current['queries']
+            stats['max_queries'] = max(stats['max_queries'], current['queries'])
+            stats['db_ms'] += db_ms
+            stats['render_ms'] += render_ms
+            stats['total_ms'] += total_ms
+            stats['n_plus_one'] += bool(repeated)
+
+        summary = (f'{request.method} {request.full_path.rstrip("?")} {response.status_code} '
+                   f'queries={current["queries"]} db={db_ms:.1f}ms render={render_ms:.1f}ms total={total_ms:.1f}ms')
+        if repeated:
+            statement, count = repeated[0]
+            self.app.logger.warning(f'Possible N+1: {summary}; ran {count}x: {statement[:200]}')
+        elif self.app.config['QUERY_LOG_REQUESTS']:
+            self.app.logger.info(summary)
+        return response
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and 'query_metrics' in g:
+            conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if not (has_request_context() and 'query_metrics' in g):
+            return
+        started = conn.info.get('query_started')
+        if not started:
+            return
+        current = g.query_metrics
+        current['queries'] += 1
+        current['db_time'] += time.perf_counter() - started.pop()
+        current['fingerprints'][fingerprint(statement)] += 1
+
+    def _before_render(self, app, template, context, **extra):
+        if 'query_metrics' in g:
+            g.query_metrics['render_started'] = time.perf_counter()
+
+    def _after_render(self, app, template, context, **extra):
+        if 'query_metrics' in g and 'render_started' in g.query_metrics:
+            g.query_metrics['render_time'] += time.perf_counter() - g.query_metrics.pop('render_started')
@@ -0,0 +1,29 @@
+"""PageVersion table for page ETags
+
+Revision ID: 0a7c3e9d5b61
+Revises: f1d6b3e8a427
+Create Date: 2026-10-18 21:12:08.604391
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0a7c3e9d5b61'
+down_revision = 'f1d6b3e8a427'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # rows appear with the first write to each tag; a missing row reads as version 0
+    op.create_table('PageVersion',
+    sa.Column('tag', sa.String(length=120), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('tag')
+    )
+
+
+def downgrade():
+    op.drop_table('PageVersion')
@@ -0,0 +1,36 @@
+"""trigram indexes for venue and artist name search
+
+Revision ID: 5b2c7e9d1a44
+Revises: 486ffed2331b
+Create Date: 2026-10-18 10:12:31.402118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b2c7e9d1a44'
+down_revision = '486ffed2331b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # GIN trigram indexes serve name ILIKE '%term%' and similarity() ranking.
+    # Only Postgres has pg_trgm; other databases search through the
+    # in-process name index instead.
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index('ix_Venue_name_trgm', 'Venue', ['name'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    op.create_index('ix_Artist_name_trgm', 'Artist', ['name'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.drop_index('ix_Artist_name_trgm', table_name='Artist')
+    op.drop_index('ix_Venue_name_trgm', table_name='Venue')
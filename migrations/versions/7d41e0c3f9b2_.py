@@ -0,0 +1,89 @@
+"""store genres in indexed VenueGenre and ArtistGenre tables
+
+Revision ID: 7d41e0c3f9b2
+Revises: 5b2c7e9d1a44
+Create Date: 2026-10-18 11:03:54.218907
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d41e0c3f9b2'
+down_revision = '5b2c7e9d1a44'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('VenueGenre',
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('genre', sa.String(length=120), nullable=False),
+    sa.ForeignKeyConstraint(['venue_id'], ['Venue.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('venue_id', 'genre')
+    )
+    op.create_index(op.f('ix_VenueGenre_genre'), 'VenueGenre', ['genre'], unique=False)
+    op.create_table('ArtistGenre',
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('genre', sa.String(length=120), nullable=False),
+    sa.ForeignKeyConstraint(['artist_id'], ['Artist.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('artist_id', 'genre')
+    )
+    op.create_index(op.f('ix_ArtistGenre_genre'), 'ArtistGenre', ['genre'], unique=False)
+
+    # move the pickled genre lists into the new tables
+    unpickle_genres('Venue', 'VenueGenre', 'venue_id')
+    unpickle_genres('Artist', 'ArtistGenre', 'artist_id')
+
+    with op.batch_alter_table('Venue') as batch_op:
+        batch_op.drop_column('genres')
+    with op.batch_alter_table('Artist') as batch_op:
+        batch_op.drop_column('genres')
+
+
+def downgrade():
+    with op.batch_alter_table('Venue') as batch_op:
+        batch_op.add_column(sa.Column('genres', sa.PickleType(), nullable=True))
+    with op.batch_alter_table('Artist') as batch_op:
+        batch_op.add_column(sa.Column('genres', sa.PickleType(), nullable=True))
+
+    pickle_genres('Venue', 'VenueGenre', 'venue_id')
+    pickle_genres('Artist', 'ArtistGenre', 'artist_id')
+
+    with op.batch_alter_table('Venue') as batch_op:
+        batch_op.alter_column('genres', existing_type=sa.PickleType(), nullable=False)
+    with op.batch_alter_table('Artist') as batch_op:
+        batch_op.alter_column('genres', existing_type=sa.PickleType(), nullable=False)
+
+    op.drop_index(op.f('ix_ArtistGenre_genre'), table_name='ArtistGenre')
+    op.drop_table('ArtistGenre')
+    op.drop_index(op.f('ix_VenueGenre_genre'), table_name='VenueGenre')
+    op.drop_table('VenueGenre')
+
+
+def unpickle_genres(table_name, genre_table_name, owner_column):
+    bind = op.get_bind()
+    table = sa.table(table_name, sa.column('id', sa.Integer()), sa.column('genres', sa.PickleType()))
+    genre_table = sa.table(genre_table_name, sa.column(owner_column, sa.Integer()), sa.column('genre', sa.String()))
+
+    rows = []
+    for id, genres in bind.execute(sa.select(table.c.id, table.c.genres)):
+        if isinstance(genres, str):
+            genres = [genres]
+        for genre in sorted(set(genres or [])):
+            rows.append({owner_column: id, 'genre': genre})
+    if rows:
+        op.bulk_insert(genre_table, rows)
+
+
+def pickle_genres(table_name, genre_table_name, owner_column):
+    bind = op.get_bind()
+    table = sa.table(table_name, sa.column('id', sa.Integer()), sa.column('genres', sa.PickleType()))
+    genre_table = sa.table(genre_table_name, sa.column(owner_column, sa.Integer()), sa.column('genre', sa.String()))
+
+    genres = {}
+    for id, genre in bind.execute(sa.select(genre_table.c[owner_column], genre_table.c.genre)):
+        genres.setdefault(id, []).append(genre)
+    for id, in bind.execute(sa.select(table.c.id)).fetchall():
+        bind.execute(table.update().where(table.c.id == id).values(genres=genres.get(id, [])))
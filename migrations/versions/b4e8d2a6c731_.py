@@ -0,0 +1,34 @@
+"""row version and updated_at on Venue, Artist and Show
+
+Revision ID: b4e8d2a6c731
+Revises: 9e6a3b5f2c18
+Create Date: 2026-10-18 12:36:48.091574
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4e8d2a6c731'
+down_revision = '9e6a3b5f2c18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table_name in ('Venue', 'Artist', 'Show'):
+        with op.batch_alter_table(table_name) as batch_op:
+            batch_op.add_column(sa.Column('version', sa.Integer(), nullable=True))
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+        op.execute(f'UPDATE "{table_name}" SET version = 1, updated_at = CURRENT_TIMESTAMP')
+        with op.batch_alter_table(table_name) as batch_op:
+            batch_op.alter_column('version', existing_type=sa.Integer(), nullable=False)
+            batch_op.alter_column('updated_at', existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade():
+    for table_name in ('Show', 'Artist', 'Venue'):
+        with op.batch_alter_table(table_name) as batch_op:
+            batch_op.drop_column('updated_at')
+            batch_op.drop_column('version')
@@ -0,0 +1,67 @@
+"""upcoming and past show counters per venue and artist
+
+Revision ID: c7f1a9e4b2d0
+Revises: b4e8d2a6c731
+Create Date: 2026-10-18 14:12:07.530216
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7f1a9e4b2d0'
+down_revision = 'b4e8d2a6c731'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('VenueShowCount',
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('upcoming', sa.Integer(), nullable=False),
+    sa.Column('past', sa.Integer(), nullable=False),
+    sa.Column('next_show', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['venue_id'], ['Venue.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('venue_id')
+    )
+    op.create_index(op.f('ix_VenueShowCount_next_show'), 'VenueShowCount', ['next_show'], unique=False)
+    op.create_table('ArtistShowCount',
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('upcoming', sa.Integer(), nullable=False),
+    sa.Column('past', sa.Integer(), nullable=False),
+    sa.Column('next_show', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['artist_id'], ['Artist.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('artist_id')
+    )
+    op.create_index(op.f('ix_ArtistShowCount_next_show'), 'ArtistShowCount', ['next_show'], unique=False)
+
+    # start times are local times, so "now" comes from here rather than the database
+    now = datetime.now()
+    count_shows('VenueShowCount', 'venue_id', now)
+    count_shows('ArtistShowCount', 'artist_id', now)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_ArtistShowCount_next_show'), table_name='ArtistShowCount')
+    op.drop_table('ArtistShowCount')
+    op.drop_index(op.f('ix_VenueShowCount_next_show'), table_name='VenueShowCount')
+    op.drop_table('VenueShowCount')
+
+
+def count_shows(count_table_name, owner_column, now):
+    show = sa.table('Show', sa.column('id', sa.Integer()), sa.column(owner_column, sa.Integer()),
+                    sa.column('start_time', sa.DateTime()))
+    counts = sa.table(count_table_name, sa.column(owner_column, sa.Integer()), sa.column('upcoming', sa.Integer()),
+                      sa.column('past', sa.Integer()), sa.column('next_show', sa.DateTime()))
+    upcoming = show.c.start_time > now
+
+    op.get_bind().execute(counts.insert().from_select(
+        [owner_column, 'upcoming', 'past', 'next_show'],
+        sa.select(show.c[owner_column],
+                  sa.func.count(sa.case((upcoming, show.c.id))),
+                  sa.func.count(sa.case((show.c.start_time <= now, show.c.id))),
+                  sa.func.min(sa.case((upcoming, show.c.start_time))))
+        .group_by(show.c[owner_column])))
@@ -0,0 +1,27 @@
+"""duration of shows
+
+Revision ID: d3b8f6a1c925
+Revises: c7f1a9e4b2d0
+Create Date: 2026-10-18 16:02:44.817305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3b8f6a1c925'
+down_revision = 'c7f1a9e4b2d0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # existing shows get the default length of two hours
+    with op.batch_alter_table('Show') as batch_op:
+        batch_op.add_column(sa.Column('duration', sa.Integer(), server_default='120', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('Show') as batch_op:
+        batch_op.drop_column('duration')
@@ -0,0 +1,69 @@
+"""venue coordinates and spatial indexes
+
+Revision ID: e5c2a7f0d814
+Revises: d3b8f6a1c925
+Create Date: 2026-10-18 17:21:09.530114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from geo import CityCentroids, encode
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5c2a7f0d814'
+down_revision = 'd3b8f6a1c925'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('Venue') as batch_op:
+        batch_op.add_column(sa.Column('latitude', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('longitude', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('geohash', sa.String(length=12), nullable=True))
+        batch_op.create_index('ix_Venue_geohash', ['geohash'], unique=False)
+
+    # existing venues are placed at the centre of their city
+    place_at_city_centres()
+
+    # With PostGIS, nearby searches use a GiST index on the venue's point.
+    # Without it (or on other databases) they use the geohash index.
+    if postgis_available():
+        op.execute('CREATE EXTENSION IF NOT EXISTS postgis')
+        op.execute('CREATE INDEX "ix_Venue_geography" ON "Venue" USING gist '
+                   '(geography(ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)))')
+
+
+def downgrade():
+    op.execute('DROP INDEX IF EXISTS "ix_Venue_geography"')
+    with op.batch_alter_table('Venue') as batch_op:
+        batch_op.drop_index('ix_Venue_geohash')
+        batch_op.drop_column('geohash')
+        batch_op.drop_column('longitude')
+        batch_op.drop_column('latitude')
+
+
+def postgis_available():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return False
+    return bind.execute(sa.text("SELECT 1 FROM pg_available_extensions WHERE name = 'postgis'")).first() is not None
+
+
+def place_at_city_centres():
+    bind = op.get_bind()
+    venue = sa.table('Venue', sa.column('city', sa.String()), sa.column('state', sa.String()),
+                     sa.column('latitude', sa.Float()), sa.column('longitude', sa.Float()),
+                     sa.column('geohash', sa.String()))
+
+    # one UPDATE per city, as spelled in the table
+    centroids = CityCentroids()
+    for city, state in bind.execute(sa.select(venue.c.city, venue.c.state).distinct()).all():
+        centroid = centroids.get(city, state)
+        if centroid is not None:
+            latitude, longitude = centroid
+            bind.execute(venue.update()
+                         .where(venue.c.city == city, venue.c.state == state)
+                         .values(latitude=latitude, longitude=longitude, geohash=encode(latitude, longitude)))
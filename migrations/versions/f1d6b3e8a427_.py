@@ -0,0 +1,27 @@
+"""updated_at indexes on Venue and Artist
+
+Revision ID: f1d6b3e8a427
+Revises: e5c2a7f0d814
+Create Date: 2026-10-18 19:04:37.286519
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1d6b3e8a427'
+down_revision = 'e5c2a7f0d814'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # the name index asks for max(updated_at) before every search
+    op.create_index('ix_Venue_updated_at', 'Venue', ['updated_at'], unique=False)
+    op.create_index('ix_Artist_updated_at', 'Artist', ['updated_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Artist_updated_at', table_name='Artist')
+    op.drop_index('ix_Venue_updated_at', table_name='Venue')
@@ -0,0 +1,77 @@
+import time
+
+from flask import current_app, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+# Flask session key holding the time until which the client reads from the primary
+_PRIMARY_UNTIL = '_read_primary_until'
+
+# WSGI environ key marking a request the app is serving, as opposed to a
+# test_request_context pushed by a CLI command or a script
+_SERVING = 'fyyur.serving'
+
+
+def route_reads(app):
+    app.before_request(_mark_serving)
+
+
+def _mark_serving():
+    request.environ[_SERVING] = True
+
+
+def reads_from_replica():
+    # GET and HEAD requests the app is serving, unless the same client wrote
+    # something moments ago
+    return (has_request_context() and request.environ.get(_SERVING)
+            and request.method in ('GET', 'HEAD')
+            and session.get(_PRIMARY_UNTIL, 0) < time.time())
+
+
+class RoutingSession(Session):
+    """Session sending the statements of read-only requests to the 'replica' bind.
+
+    GET and HEAD requests served by an app set up with route_reads() read
+    from the replica when SQLALCHEMY_BINDS has one. Everything else goes to
+    the primary: other requests, CLI commands and scripts, every INSERT,
+    UPDATE or DELETE, and the rest of a transaction that has written or
+    flushed. For REPLICA_READ_YOUR_WRITES seconds after a commit the same
+    client reads from the primary, so it sees its own change whatever the
+    replication lag.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self.writes(clause) and reads_from_replica():
+            replica = self._db.engines.get('replica')
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def writes(self, clause=None):
+        if clause is not None and getattr(clause, 'is_dml', False):
+            self.info['wrote'] = True
+        return self._flushing or self.info.get('wrote') or bool(self.new or self.dirty or self.deleted)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_wrote(db_session, flush_context):
+    db_session.info['wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'after_transaction_end')
+def _clear_wrote(db_session, transaction):
+    if transaction.parent is None:
+        db_session.info.pop('wrote', None)
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _stick_to_primary(db_session):
+    if has_request_context() and 'replica' in db_session._db.engines:
+        session[_PRIMARY_UNTIL] = time.time() + current_app.config['REPLICA_READ_YOUR_WRITES']
+
+
+def read_engine(db):
+    # engine for reads made outside the session, such as streamed exports
+    if reads_from_replica() and 'replica' in db.engines:
+        return db.engines['replica']
+    return db.engine
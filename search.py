@@ -0,0 +1,156 @@
+import bisect
+import heapq
+import threading
+from collections import defaultdict
+
+# Longest substring kept in the index. Terms up to this length are answered by a
+# single set lookup; longer terms intersect the sets of their trigrams and then
+# check the candidates, which keeps the partial, case-insensitive matching of
+# name ILIKE '%term%' without scanning every name.
+GRAM_SIZE = 3
+
+
+def grams(text):
+    # every distinct substring of text of length 1 to GRAM_SIZE
+    return {text[i:i + n]
+            for n in range(1, GRAM_SIZE + 1)
+            for i in range(len(text) - n + 1)}
+
+
+def word_starts(lowered):
+    # the name itself and what follows each space in it, the keys a prefix is matched against
+    return [lowered] + [lowered[i + 1:] for i, char in enumerate(lowered) if char == ' ' and lowered[i + 1:i + 2].strip()]
+
+
+def match_rank(name, term):
+    # exact match first, then prefix, then start of a word, then anywhere;
+    # shorter names before longer ones
+    if name == term:
+        position = 0
+    elif name.startswith(term):
+        position = 1
+    elif (' ' + term) in name:
+        position = 2
+    else:
+        position = 3
+    return position, len(name), name
+
+
+class NameIndex(object):
+    """In-process inverted index over (id, name) pairs.
+
+    Used to serve name searches without a database scan on backends that
+    have no trigram index (SQLite), and as-you-type suggestions on every
+    backend. Keep it current with add() and remove() when names are
+    created, edited or deleted, and with retain() when other processes may
+    have deleted some.
+    """
+
+    def __init__(self, rows=()):
+        self._lock = threading.Lock()
+        self._names = {}
+        self._postings = defaultdict(set)
+        # sorted (key, id) pairs for prefix lookups: the whole lowered name, and
+        # separately the part of it from each later word on
+        self._prefixes = []
+        self._word_prefixes = []
+        for id, name in rows:
+            self._add(id, name, sort=False)
+        self._prefixes.sort()
+        self._word_prefixes.sort()
+
+    def __len__(self):
+        return len(self._names)
+
+    def add(self, id, name):
+        with self._lock:
+            self._remove(id)
+            self._add(id, name)
+
+    def remove(self, id):
+        with self._lock:
+            self._remove(id)
+
+    def retain(self, ids):
+        # removes every name whose id is not in ids
+        with self._lock:
+            for id in [id for id in self._names if id not in ids]:
+                self._remove(id)
+
+    def search(self, term, limit=None, within=None):
+        # returns the total number of matches and the best `limit` (id, name) pairs,
+        # only counting ids in `within` when it is given
+        term = term.lower()
+        with self._lock:
+            if not term:
+                candidates = list(self._names)
+            elif len(term) <= GRAM_SIZE:
+                candidates = list(self._postings.get(term, ()))
+            else:
+                postings = sorted((self._postings.get(gram, set()) for gram in grams(term)
+                                   if len(gram) == GRAM_SIZE), key=len)
+                candidates = [id for id in set.intersection(*postings)
+                              if term in self._names[id][1]]
+            if within is not None:
+                candidates = [id for id in candidates if id in within]
+            matches = [(id, self._names[id]) for id in candidates]
+
+        key = lambda match: match_rank(match[1][1], term) + (match[0],)
+        if limit is None:
+            ranked = sorted(matches, key=key)
+        else:
+            ranked = heapq.nsmallest(limit, matches, key=key)
+
+        return len(matches), [(id, name) for id, (name, _) in ranked]
+
+    def suggest(self, prefix, limit):
+        # up to `limit` (id, name) pairs whose name, or one of its words, starts
+        # with prefix: names starting with it first, each group in name order
+        prefix = prefix.lower().lstrip()
+        if not prefix:
+            return []
+        seen = set()
+        suggestions = []
+        with self._lock:
+            for keys in (self._prefixes, self._word_prefixes):
+                position = bisect.bisect_left(keys, (prefix,))
+                while len(suggestions) < limit and position < len(keys) and keys[position][0].startswith(prefix):
+                    id = keys[position][1]
+                    position += 1
+                    if id not in seen:
+                        seen.add(id)
+                        suggestions.append((id, self._names[id][0]))
+        return suggestions
+
+    def _add(self, id, name, sort=True):
+        lowered = name.lower()
+        self._names[id] = (name, lowered)
+        for gram in grams(lowered):
+            self._postings[gram].add(id)
+
+        starts = word_starts(lowered)
+        add = bisect.insort if sort else list.append
+        add(self._prefixes, (starts[0], id))
+        for key in starts[1:]:
+            add(self._word_prefixes, (key, id))
+
+    def _remove(self, id):
+        entry = self._names.pop(id, None)
+        if entry is None:
+            return
+        for gram in grams(entry[1]):
+            ids = self._postings[gram]
+            ids.discard(id)
+            if not ids:
+                del self._postings[gram]
+
+        starts = word_starts(entry[1])
+        discard_sorted(self._prefixes, (starts[0], id))
+        for key in starts[1:]:
+            discard_sorted(self._word_prefixes, (key, id))
+
+
+def discard_sorted(items, item):
+    position = bisect.bisect_left(items, item)
+    if position < len(items) and items[position] == item:
+        del items[position]
@@ -0,0 +1,163 @@
+"""Fill the database with synthetic venues, artists and shows.
+
+  $ python seed.py --scale 100k
+  $ DATABASE_URL=sqlite:///bench.db python seed.py --scale 10k --create-tables
+
+Scales name the number of shows; there is one venue per 20 shows and one
+artist per 10. Rows are inserted in batches with executemany and shows are
+spread from five years ago to one year ahead, so every page has both past
+and upcoming shows.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from app import app, db, Venue, Artist, Show, VenueGenre, ArtistGenre, refresh_show_counts
+from forms import genre_choices
+from geo import CityCentroids, encode
+
+SCALES = {'10k': 10000, '100k': 100000, '1m': 1000000}
+BATCH_SIZE = 5000
+
+CITIES = [
+    ('San Francisco', 'CA'), ('Los Angeles', 'CA'), ('San Diego', 'CA'), ('Oakland', 'CA'),
+    ('New York', 'NY'), ('Brooklyn', 'NY'), ('Buffalo', 'NY'), ('Austin', 'TX'),
+    ('Houston', 'TX'), ('Dallas', 'TX'), ('Chicago', 'IL'), ('Seattle', 'WA'),
+    ('Portland', 'OR'), ('Denver', 'CO'), ('Nashville', 'TN'), ('Memphis', 'TN'),
+    ('New Orleans', 'LA'), ('Atlanta', 'GA'), ('Miami', 'FL'), ('Boston', 'MA'),
+    ('Philadelphia', 'PA'), ('Detroit', 'MI'), ('Minneapolis', 'MN'), ('Phoenix', 'AZ'),
+]
+VENUE_WORDS = ['Hall', 'Lounge', 'Club', 'Room', 'Theatre', 'Bar', 'Garden', 'Cellar',
+               'House', 'Arena', 'Stage', 'Tavern', 'Loft', 'Warehouse', 'Cafe']
+ADJECTIVES = ['Blue', 'Velvet', 'Golden', 'Electric', 'Midnight', 'Wild', 'Silver', 'Rusty',
+              'Crimson', 'Hidden', 'Lucky', 'Neon', 'Dueling', 'Musical', 'Broken', 'Little']
+NOUNS = ['Petals', 'Pianos', 'Owls', 'Wolves', 'Strings', 'Echoes', 'Foxes', 'Rivers',
+         'Sparrows', 'Drums', 'Lanterns', 'Comets', 'Tigers', 'Saints', 'Ghosts', 'Horns']
+STREETS = ['Main St', 'Market St', 'Broadway', 'Oak Ave', 'Mission St', '1st Ave', 'Elm St', 'Pine St']
+GENRES = [value for value, _ in genre_choices]
+
+
+def batches(rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def insert(table, rows):
+    count = 0
+    for batch in batches(rows):
+        db.session.execute(table.insert(), batch)
+        count += len(batch)
+    return count
+
+
+def phone(rng):
+    return f'{rng.randint(200, 999)}-{rng.randint(200, 999)}-{rng.randint(1000, 9999)}'
+
+
+def venue_rows(rng, first_id, count):
+    centroids = CityCentroids()
+    for id in range(first_id, first_id + count):
+        city, state = rng.choice(CITIES)
+        # spread around the city centre, most within 10 km of it
+        latitude, longitude = centroids.get(city, state)
+        latitude += rng.gauss(0, 0.05)
+        longitude += rng.gauss(0, 0.06)
+        yield {
+            'id': id,
+            'name': f'The {rng.choice(ADJECTIVES)} {rng.choice(VENUE_WORDS)} {id}',
+            'address': f'{rng.randint(1, 9999)} {rng.choice(STREETS)}',
+            'city': city,
+            'state': state,
+            'phone': phone(rng),
+            'website': f'https://venue{id}.example.com',
+            'facebook_link': f'https://www.facebook.com/venue{id}',
+            'seeking_talent': rng.random() < 0.4,
+            'seeking_description': 'Looking for local acts on weekends.',
+            'image_link': f'https://images.example.com/venues/{id}.jpg',
+            'latitude': latitude,
+            'longitude': longitude,
+            'geohash': encode(latitude, longitude),
+        }
+
+
+def artist_rows(rng, first_id, count):
+    for id in range(first_id, first_id + count):
+        city, state = rng.choice(CITIES)
+        yield {
+            'id': id,
+            'name': f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {id}',
+            'city': city,
+            'state': state,
+            'phone': phone(rng),
+            'website': f'https://artist{id}.example.com',
+            'facebook_link': f'https://www.facebook.com/artist{id}',
+            'seeking_venue': rng.random() < 0.3,
+            'seeking_description': 'Available for touring.',
+            'image_link': f'https://images.example.com/artists/{id}.jpg',
+        }
+
+
+def genre_rows(rng, owner_column, first_id, count):
+    for id in range(first_id, first_id + count):
+        for genre in rng.sample(GENRES, rng.randint(1, 3)):
+            yield {owner_column: id, 'genre': genre}
+
+
+def show_rows(rng, venue_ids, artist_ids, count):
+    start = datetime.now().replace(minute=0, second=0, microsecond=0) - timedelta(days=5 * 365)
+    span_hours = 6 * 365 * 24
+    # a few venues and artists get most of the shows, like real listings
+    for _ in range(count):
+        yield {
+            'venue_id': venue_ids[min(int(rng.paretovariate(1.2)) - 1, len(venue_ids) - 1)]
+                        if rng.random() < 0.2 else rng.choice(venue_ids),
+            'artist_id': rng.choice(artist_ids),
+            'start_time': start + timedelta(hours=rng.randrange(span_hours)),
+            'duration': rng.choice((60, 90, 120, 180)),
+        }
+
+
+def seed(shows, random_seed=0):
+    rng = random.Random(random_seed)
+    venues = max(shows // 20, 1)
+    artists = max(shows // 10, 1)
+    first_venue = (db.session.query(db.func.max(Venue.id)).scalar() or 0) + 1
+    first_artist = (db.session.query(db.func.max(Artist.id)).scalar() or 0) + 1
+
+    started = time.perf_counter()
+    insert(Venue.__table__, venue_rows(rng, first_venue, venues))
+    insert(VenueGenre.__table__, genre_rows(rng, 'venue_id', first_venue, venues))
+    insert(Artist.__table__, artist_rows(rng, first_artist, artists))
+    insert(ArtistGenre.__table__, genre_rows(rng, 'artist_id', first_artist, artists))
+    insert(Show.__table__, show_rows(rng,
+                                     list(range(first_venue, first_venue + venues)),
+                                     list(range(first_artist, first_artist + artists)),
+                                     shows))
+    refresh_show_counts(Venue)
+    refresh_show_counts(Artist)
+    db.session.commit()
+    elapsed = time.perf_counter() - started
+
+    print(f'Inserted {venues} venues, {artists} artists and {shows} shows in {elapsed:.1f}s')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', choices=sorted(SCALES), default='10k')
+    parser.add_argument('--shows', type=int, help='exact number of shows, overrides --scale')
+    parser.add_argument('--seed', type=int, default=0, help='random seed, for repeatable data')
+    parser.add_argument('--create-tables', action='store_true',
+                        help='create missing tables from the models instead of running migrations first')
+    args = parser.parse_args()
+
+    with app.app_context():
+        if args.create_tables:
+            db.create_all()
+        seed(args.shows or SCALES[args.scale], args.seed)
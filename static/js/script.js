@@ -2,3 +2,31 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// As-you-type suggestions for the venue and artist search boxes
+document.querySelectorAll('input[data-suggest]').forEach(function (input) {
+  var list = document.getElementById(input.getAttribute('list'));
+  var pending = null;
+  input.addEventListener('input', function () {
+    var term = input.value.trim();
+    if (pending) {
+      pending.abort();
+    }
+    if (!term) {
+      list.innerHTML = '';
+      return;
+    }
+    pending = new AbortController();
+    fetch(input.dataset.suggest + '?q=' + encodeURIComponent(term), { signal: pending.signal })
+      .then(function (response) { return response.json(); })
+      .then(function (suggestions) {
+        list.innerHTML = '';
+        suggestions.data.forEach(function (suggestion) {
+          var option = document.createElement('option');
+          option.value = suggestion.name;
+          list.appendChild(option);
+        });
+      })
+      .catch(function () {});
+  });
+});
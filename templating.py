@@ -0,0 +1,64 @@
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+
+from cache import LRUCache, NullCache
+
+
+class FragmentCacheExtension(Extension):
+    """{% cache 'show-tile', show.id, show.version %}...{% endcache %}
+
+    Renders the block once per distinct key and serves it from the
+    environment's fragment_cache afterwards. The key names the fragment and
+    the id and version of every entity it shows, so an edit, which bumps
+    the version, yields a new key and the stale fragment ages out of the LRU.
+    """
+
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=NullCache())
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            key.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(self.call_method('_render', [nodes.List(key)]), [], [], body).set_lineno(lineno)
+
+    def _render(self, key, caller):
+        key = ':'.join(str(part) for part in key)
+        fragment = self.environment.fragment_cache.get(key)
+        if fragment is None:
+            fragment = caller()
+            self.environment.fragment_cache.set(key, fragment)
+        return fragment
+
+
+class TemplateCache(object):
+    """Compiled template and rendered fragment caching for the app's Jinja environment.
+
+    Compiled templates are kept in TEMPLATE_BYTECODE_CACHE_DIR (the user's
+    temporary directory by default), so every worker on the host loads the
+    bytecode the first one compiled instead of compiling the templates again.
+    Fragments of the {% cache %} tag are kept in each worker, at most
+    FRAGMENT_CACHE_MAX_ENTRIES of them; 0 renders them every time.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('TEMPLATE_BYTECODE_CACHE', True)
+        app.config.setdefault('TEMPLATE_BYTECODE_CACHE_DIR', None)
+        app.config.setdefault('FRAGMENT_CACHE_MAX_ENTRIES', 4096)
+
+        environment = app.jinja_env
+        if app.config['TEMPLATE_BYTECODE_CACHE']:
+            environment.bytecode_cache = FileSystemBytecodeCache(app.config['TEMPLATE_BYTECODE_CACHE_DIR'])
+        environment.add_extension(FragmentCacheExtension)
+        if app.config['FRAGMENT_CACHE_MAX_ENTRIES']:
+            environment.fragment_cache = LRUCache(app.config['FRAGMENT_CACHE_MAX_ENTRIES'])
+        app.extensions['template_cache'] = self
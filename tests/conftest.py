@@ -0,0 +1,23 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# app.py reads the configuration on import, so the database is chosen first
+DATABASE_DIR = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(DATABASE_DIR, 'fyyur.db')
+os.environ.pop('DATABASE_REPLICA_URL', None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as fyyur  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    fyyur.app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    with fyyur.app.app_context():
+        fyyur.db.create_all()
+    yield fyyur.app.test_client()
+    with fyyur.app.app_context():
+        fyyur.db.drop_all()
@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta
+
+VENUE = {
+    'name': 'The Musical Hop', 'city': 'San Francisco', 'state': 'CA', 'address': '1015 Folsom Street',
+    'phone': '123-123-1234', 'genres': ['Jazz'], 'seeking_talent': 'No',
+    'image_link': 'https://example.com/venue.jpg', 'facebook_link': 'https://www.facebook.com/TheMusicalHop',
+}
+ARTIST = {
+    'name': 'Guns N Petals', 'city': 'San Francisco', 'state': 'CA', 'phone': '326-123-5000',
+    'genres': ['Rock n Roll'], 'seeking_venue': 'No',
+    'image_link': 'https://example.com/artist.jpg', 'facebook_link': 'https://www.facebook.com/GunsNPetals',
+}
+
+
+def create_show(client, days_ahead):
+    start_time = datetime.now().replace(microsecond=0) + timedelta(days=days_ahead)
+    client.post('/shows/create', data={'venue_id': 1, 'artist_id': 1, 'duration': 120,
+                                       'start_time': f'{start_time:%Y-%m-%d %H:%M:%S}'})
+
+
+def upcoming_shows(client, path):
+    return [artist['num_upcoming_shows'] for artist in client.get(path).get_json()['data']]
+
+
+def test_artist_api_counts_follow_new_shows(client):
+    client.post('/venues/create', data=VENUE)
+    client.post('/artists/create', data=ARTIST)
+    create_show(client, 7)
+    # cached with one upcoming show
+    assert upcoming_shows(client, '/api/artists') == [1]
+    assert upcoming_shows(client, '/api/artists/search?q=petals') == [1]
+
+    create_show(client, 14)
+    assert upcoming_shows(client, '/api/artists') == [2]
+    assert upcoming_shows(client, '/api/artists/search?q=petals') == [2]
@@ -0,0 +1,47 @@
+from sqlalchemy import event
+
+import app as fyyur
+from test_api_cache import ARTIST, VENUE, create_show
+
+
+def test_pages_revalidate_until_their_shows_change(client):
+    client.post('/venues/create', data=VENUE)
+    client.post('/artists/create', data=ARTIST)
+    create_show(client, 7)
+
+    for path in ('/venues', '/venues/1', '/artists/1', '/shows'):
+        etag = client.get(path).headers['ETag']
+        assert client.get(path, headers={'If-None-Match': etag}).status_code == 304
+
+        create_show(client, 7 + len(path))
+        response = client.get(path, headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+
+
+def test_missing_pages_are_not_validated(client):
+    assert client.get('/venues/1', headers={'If-None-Match': '"x"'}).status_code == 404
+
+
+def test_cached_pages_are_validated_without_queries(client):
+    client.post('/venues/create', data=VENUE)
+    client.post('/artists/create', data=ARTIST)
+    create_show(client, 7)
+    etag = client.get('/venues/1').headers['ETag']
+
+    statements = []
+
+    def record(connection, cursor, statement, *args):
+        statements.append(statement)
+
+    with fyyur.app.app_context():
+        engine = fyyur.db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        assert client.get('/venues/1', headers={'If-None-Match': etag}).status_code == 304
+        response = client.get('/venues/1')
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    assert response.status_code == 200
+    assert response.headers['ETag'] == etag
+    assert statements == []
@@ -0,0 +1,27 @@
+import pytest
+
+import app as fyyur
+
+
+@pytest.fixture
+def metrics_config():
+    config = fyyur.app.config
+    saved = {key: config[key] for key in ('METRICS_TOKEN', 'METRICS_WITHOUT_TOKEN')}
+    yield config
+    config.update(saved)
+
+
+def test_metrics_need_the_token(client, metrics_config):
+    metrics_config.update(METRICS_TOKEN='secret', METRICS_WITHOUT_TOKEN=False)
+    assert client.get('/_internal/metrics').status_code == 404
+    assert client.get('/_internal/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 404
+    assert client.get('/_internal/metrics', headers={'Authorization': 'Bearer secret'}).status_code == 200
+    assert client.get('/_internal/pools', headers={'Authorization': 'Bearer secret'}).status_code == 200
+
+
+def test_local_requests_need_the_opt_in_without_a_token(client, metrics_config):
+    # the test client connects from 127.0.0.1, as every request does behind a local proxy
+    metrics_config.update(METRICS_TOKEN=None, METRICS_WITHOUT_TOKEN=False)
+    assert client.get('/_internal/metrics').status_code == 404
+    metrics_config.update(METRICS_WITHOUT_TOKEN=True)
+    assert client.get('/_internal/metrics').status_code == 200